@@ -29,7 +29,10 @@ class Settings:
             "chat": {
                 "max_tokens": 100,
                 "temperature": 0.7,
-                "max_history": 10
+                "max_history": 10,
+                "timeout": 30,
+                "max_connections": 10,
+                "max_keepalive_connections": 5
             },
             "logging": {
                 "level": "INFO",
@@ -121,7 +124,10 @@ class Settings:
             "model": self.get("model"),
             "endpointUrl": self.get("endpointUrl"),
             "max_tokens": self.get("chat.max_tokens"),
-            "temperature": self.get("chat.temperature")
+            "temperature": self.get("chat.temperature"),
+            "timeout": self.get("chat.timeout"),
+            "max_connections": self.get("chat.max_connections"),
+            "max_keepalive_connections": self.get("chat.max_keepalive_connections")
         }
     
     def get_server_config(self) -> Dict:
@@ -0,0 +1,80 @@
+"""
+字幕視窗切分
+以 NumPy 陣列處理字幕的 offset 與 duration，依影片實際時間切成固定長度的視窗，
+可選擇依靜音間隔切開，並合併說話時間過短的視窗
+"""
+
+import numpy as np
+
+
+def _to_arrays(content):
+    """取出有文字的字幕段落，返回依 offset 排序的 (offsets, durations, texts)"""
+    items = [item for item in content if isinstance(item, dict) and item.get("text")]
+    if not items:
+        return np.empty(0), np.empty(0), []
+
+    offsets = np.fromiter((float(item.get("offset") or 0) for item in items), dtype=np.float64, count=len(items))
+    durations = np.fromiter((float(item.get("duration") or 0) for item in items), dtype=np.float64, count=len(items))
+
+    order = np.argsort(offsets, kind="stable")
+    texts = [items[i]["text"] for i in order]
+    return offsets[order], durations[order], texts
+
+
+def segment_windows(content, window_ms=60000, min_speech_ms=0, gap_split_ms=0):
+    """將字幕段落切成視窗
+
+    Args:
+        content (list): Supadata 轉錄段落 [{"text", "offset", "duration"}]（毫秒）
+        window_ms (int): 視窗長度，視窗邊界對齊影片時間 0、window_ms、2*window_ms…
+        min_speech_ms (int): 每個視窗最少的說話時間，不足時併入前一個視窗
+        gap_split_ms (int): 兩段字幕間的靜音超過此值時另開視窗（0 表示不依靜音切開）
+
+    Returns:
+        list: [{"time": 視窗第一段字幕的 offset, "end": 最後一段字幕的結束時間,
+                "speech_ms": 說話時間, "captions": [文字, ...]}]
+    """
+    offsets, durations, texts = _to_arrays(content)
+    if not texts:
+        return []
+
+    # 視窗起點：跨越時間格線，或與上一段之間的靜音過長
+    boundaries = np.zeros(len(offsets), dtype=bool)
+    boundaries[0] = True
+    if len(offsets) > 1:
+        grid = np.floor_divide(offsets, window_ms) if window_ms > 0 else np.zeros(len(offsets))
+        boundaries[1:] = grid[1:] != grid[:-1]
+        if gap_split_ms > 0:
+            gaps = offsets[1:] - (offsets[:-1] + durations[:-1])
+            boundaries[1:] |= gaps >= gap_split_ms
+
+    starts = np.flatnonzero(boundaries)
+    stops = np.append(starts[1:], len(offsets))
+    speech = np.add.reduceat(durations, starts)
+    ends = np.maximum.reduceat(offsets + durations, starts)
+
+    windows = []
+    for start, stop, speech_ms, end in zip(starts.tolist(), stops.tolist(), speech.tolist(), ends.tolist()):
+        window = {
+            "time": int(offsets[start]) if float(offsets[start]).is_integer() else float(offsets[start]),
+            "end": end,
+            "speech_ms": speech_ms,
+            "captions": texts[start:stop]
+        }
+        # 說話時間不足的視窗併入前一個視窗
+        if windows and speech_ms < min_speech_ms:
+            previous = windows[-1]
+            previous["captions"] = previous["captions"] + window["captions"]
+            previous["speech_ms"] += speech_ms
+            previous["end"] = max(previous["end"], end)
+            continue
+        windows.append(window)
+
+    # 第一個視窗說話時間不足時併入下一個視窗
+    if len(windows) > 1 and windows[0]["speech_ms"] < min_speech_ms:
+        first = windows.pop(0)
+        windows[0]["captions"] = first["captions"] + windows[0]["captions"]
+        windows[0]["speech_ms"] += first["speech_ms"]
+        windows[0]["time"] = first["time"]
+
+    return windows
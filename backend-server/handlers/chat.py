@@ -4,22 +4,51 @@
 處理與 LLM 相關的請求
 """
 
-import asyncio
+import json
 import logging
-import requests
-from typing import Dict, List
+import httpx
+from typing import AsyncIterator, Dict, List, Optional
+
+from services.async_runtime import AsyncRuntime
+
 logger = logging.getLogger(__name__)
 
 
 class ChatHandler:
     """聊天處理器"""
     
-    def __init__(self, llm_config: Dict, tools_handler=None):
+    def __init__(self, llm_config: Dict, tools_handler=None, runtime: Optional[AsyncRuntime] = None):
         self.llm_model = llm_config.get("model", "Llama-3.2-1B-Instruct-CPU")
         self.llm_endpoint = llm_config.get("endpointUrl", "http://localhost:8000/api/v1")
         self.tools_handler = tools_handler
         self.conversation_history = []
         self.max_history = 10
+        
+        # 共用的事件迴圈與 HTTP 連線池（keep-alive）
+        self.runtime = runtime or AsyncRuntime(name="chat-runtime")
+        self.request_timeout = llm_config.get("timeout") or 30
+        self.http_limits = httpx.Limits(
+            max_connections=llm_config.get("max_connections") or 10,
+            max_keepalive_connections=llm_config.get("max_keepalive_connections") or 5
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """獲取共用的非同步 HTTP 客戶端（在事件迴圈內延遲建立）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.llm_endpoint,
+                limits=self.http_limits,
+                timeout=self.request_timeout,
+                headers={"Content-Type": "application/json"}
+            )
+        return self._client
+    
+    async def aclose(self):
+        """關閉 HTTP 客戶端"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
     
     async def process_message(self, user_message: str) -> str:
         """處理聊天消息"""
@@ -92,12 +121,7 @@ class ChatHandler:
                 "temperature": 0.7
             }
             
-            response = requests.post(
-                f"{self.llm_endpoint}/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
+            response = await self._get_client().post("/chat/completions", json=payload)
             
             response.raise_for_status()
             result = response.json()
@@ -108,8 +132,49 @@ class ChatHandler:
             logger.error(f"LLM API call failed: {e}")
             return "抱歉，LLM 服務暫時無法使用 😅"
     
+    async def _call_llm_stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        """以 stream=true 調用 LLM API，逐一產生增量文字"""
+        payload = {
+            "model": self.llm_model,
+            "messages": messages,
+            "max_tokens": 100,
+            "temperature": 0.7,
+            "stream": True
+        }
+        
+        async with self._get_client().stream(
+            "POST",
+            "/chat/completions",
+            json=payload,
+            headers={"Accept": "text/event-stream"}
+        ) as response:
+            response.raise_for_status()
+            
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping malformed stream chunk: {data[:50]}")
+                    continue
+                
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+    
     def call_llm_stream(self, user_message: str):
-        """流式調用 LLM（簡化版本）"""
+        """流式調用 LLM，逐步轉發 LLM 產生的增量內容"""
+        full_response = ""
         try:
             # 添加到對話歷史
             self.conversation_history.append({
@@ -124,34 +189,29 @@ class ChatHandler:
             # 準備系統消息
             system_message = self._build_system_message(user_message)
             
-            # 調用 LLM
+            # 調用 LLM 並轉發增量內容
             messages = [system_message] + self.conversation_history[-self.max_history:]
-            response = asyncio.run(self._call_llm(messages))          
-            
-            # 組合最終響應
-            final_response = response
-            
-            # 添加助手回應到歷史
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": final_response
-            })
-            
-            # 模擬流式返回
-            words = final_response.split()
-            if not words:
-                yield {"content": "抱歉，我現在無法回應 😅", "fullResponse": "抱歉，我現在無法回應 😅"}
-                return
-                
-            for i, word in enumerate(words):
+            for delta in self.runtime.iterate(self._call_llm_stream(messages)):
+                full_response += delta
                 yield {
-                    "content": word + (" " if i < len(words) - 1 else ""),
-                    "fullResponse": " ".join(words[:i+1])
+                    "content": delta,
+                    "fullResponse": full_response
                 }
+            
+            if not full_response.strip():
+                full_response = "抱歉，我現在無法回應 😅"
+                yield {"content": full_response, "fullResponse": full_response}
                 
         except Exception as e:
             logger.error(f"Stream LLM call failed: {e}")
             yield {"error": f"抱歉，處理您的消息時發生錯誤: {str(e)}"}
+        finally:
+            # 添加助手回應到歷史（包含中途中斷時已產生的部分）
+            if full_response:
+                self.conversation_history.append({
+                    "role": "assistant",
+                    "content": full_response.strip()
+                })
         
     def clear_history(self):
         """清除對話歷史"""
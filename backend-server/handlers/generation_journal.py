@@ -0,0 +1,111 @@
+"""
+角色回應生成日誌
+每完成一個片段就在 avatar_talk/<video_id>.journal.jsonl 追加一行，程式中斷後可略過已完成的片段繼續生成
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def journal_path_for(output_file):
+    """avatar_talk 輸出檔對應的日誌路徑"""
+    base, _ = os.path.splitext(output_file)
+    return f"{base}.journal.jsonl"
+
+
+def segments_signature(segments):
+    """片段切分的簽章；字幕或切分設定改變時舊日誌不再適用"""
+    payload = json.dumps(
+        [[segment["time"], segment.get("text", segment.get("captions"))] for segment in segments],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def remove_journal(path):
+    """輸出完成後刪除日誌"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class GenerationJournal:
+    """追加式片段完成日誌（JSON Lines）"""
+
+    def __init__(self, path, signature, total):
+        self.path = path
+        self.signature = signature
+        self.total = total
+        self._file = None
+
+    def load(self):
+        """讀取已完成的片段 {index: entry}；簽章不符或沒有日誌時返回空字典"""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except IOError as e:
+            logger.warning(f"無法讀取生成日誌 {self.path}: {e}")
+            return completed
+
+        for number, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中斷時可能留下寫到一半的最後一行
+                logger.debug(f"略過生成日誌第 {number + 1} 行（無法解析）")
+                continue
+
+            if number == 0:
+                if record.get("type") != "header" or record.get("signature") != self.signature:
+                    logger.info(f"生成日誌與目前字幕不符，重新開始: {self.path}")
+                    return {}
+                continue
+
+            index = record.get("index")
+            entry = record.get("entry")
+            if isinstance(index, int) and 0 <= index < self.total and isinstance(entry, dict):
+                completed[index] = entry
+
+        return completed
+
+    def open(self, resume):
+        """開啟日誌以追加記錄；不續接時以新的標頭覆寫"""
+        if resume and os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                last_byte = b"\n"
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    last_byte = f.read(1)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if last_byte != b"\n":
+                # 補上換行，避免新紀錄接在寫到一半的行後面
+                self._file.write("\n")
+            return
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"type": "header", "signature": self.signature, "windows": self.total})
+
+    def record(self, index, entry):
+        """記錄一個完成的片段（立即寫入磁碟）"""
+        self._write({"type": "window", "index": index, "entry": entry})
+
+    def close(self):
+        """關閉日誌檔"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        """寫入一行並同步到磁碟"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -1,24 +1,82 @@
 import time
+import hashlib
 import json
+import os
 import re
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from openai import OpenAI
 
+try:
+    from .caption_windows import segment_windows
+    from .generation_journal import GenerationJournal, journal_path_for, remove_journal, segments_signature
+    from .prompt_builder import build_caption_text, estimate_tokens
+    from .reply_cache import ReplyCache
+except ImportError:
+    # 作為獨立腳本執行時
+    from caption_windows import segment_windows
+    from generation_journal import GenerationJournal, journal_path_for, remove_journal, segments_signature
+    from prompt_builder import build_caption_text, estimate_tokens
+    from reply_cache import ReplyCache
+
 # Initialize lemonade client (referencing lem.py)
 client = OpenAI(
     base_url="http://localhost:8000/api/v1",
     api_key="lemonade"  # 需要帶但不驗證
 )
 
+LLM_MODEL = "user.Roleplay-Llama-3-8B-i1-GGUF"
+
+# 採樣參數（會傳給 LLM 並納入快取鍵）
+LLM_PARAMS = {}
+
+# 同時送往 LLM 服務器的請求上限（依服務器容量調整，所有影片共用）
+MAX_INFLIGHT = max(1, int(os.environ.get("MESSAGE_GEN_MAX_INFLIGHT", "4")))
+# 同時送往語音生成服務器的請求上限
+VOICE_INFLIGHT = max(1, int(os.environ.get("MESSAGE_GEN_VOICE_INFLIGHT", "2")))
+# 批次處理時同時處理的影片數
+JOBS = max(1, int(os.environ.get("MESSAGE_GEN_JOBS", "2")))
+
+LLM_SLOTS = threading.BoundedSemaphore(MAX_INFLIGHT)
+VOICE_SLOTS = threading.BoundedSemaphore(VOICE_INFLIGHT)
+
+# 批次模式：一個請求包含的連續片段數（1 表示每個片段單獨請求）
+BATCH_SIZE = max(1, int(os.environ.get("MESSAGE_GEN_BATCH_SIZE", "1")))
+
+# 每個片段字幕文字的 token 預算（0 表示不限制）
+PROMPT_TOKEN_BUDGET = max(0, int(os.environ.get("MESSAGE_GEN_PROMPT_BUDGET", "400")))
+
+# 每個回應涵蓋的字幕時間長度（毫秒），視窗邊界對齊影片時間
+TIME_PER_SUMMARY = int(os.environ.get("MESSAGE_GEN_WINDOW_MS", "60000"))
+# 每個視窗最少的說話時間（毫秒），不足時併入相鄰視窗
+MIN_SPEECH_MS = int(os.environ.get("MESSAGE_GEN_MIN_SPEECH_MS", "5000"))
+# 字幕間靜音超過此值（毫秒）時另開視窗，0 表示不依靜音切開
+GAP_SPLIT_MS = int(os.environ.get("MESSAGE_GEN_GAP_SPLIT_MS", "0"))
+
+# LLM 回應快取（相同模型、提示詞、角色與參數直接使用先前的回復）
+REPLY_CACHE_DIR = os.environ.get(
+    "MESSAGE_GEN_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", ".cache", "llm_replies")
+)
+REPLY_CACHE_MAX_MB = float(os.environ.get("MESSAGE_GEN_CACHE_MAX_MB", "64"))
+reply_cache = ReplyCache(REPLY_CACHE_DIR, max_bytes=int(REPLY_CACHE_MAX_MB * 1024 * 1024))
+
 # 語音生成服務器配置
 VOICE_GENERATION_SERVER_URL = "http://localhost:5001/api/generate_voice_batch"
+# 語音生成服務器佇列已滿（429）時的重試次數與單次最長等待秒數
+VOICE_RETRY_ATTEMPTS = max(0, int(os.environ.get("MESSAGE_GEN_VOICE_RETRIES", "5")))
+VOICE_RETRY_MAX_WAIT = float(os.environ.get("MESSAGE_GEN_VOICE_RETRY_MAX_WAIT", "60"))
 
 # Pattern to remove think blocks (from lem.py)
 THINK_BLOCK = re.compile(r"<\s*think\b[^>]*>.*?<\s*/\s*think\s*>",
                          flags=re.IGNORECASE | re.DOTALL)
 
+# 批次回覆的 JSON 陣列與逐行編號格式（「1. xxx」「片段2：xxx」）
+JSON_ARRAY = re.compile(r"\[.*\]", flags=re.DOTALL)
+NUMBERED_LINE = re.compile(r"^\s*(?:片段)?\s*(\d+)\s*[.:：、)\]]\s*(.+?)\s*$", flags=re.MULTILINE)
+
 # ========= 2) 檔案路徑 =========
-import os
 import glob
 
 # 基礎路徑
@@ -30,18 +88,36 @@ AVATAR_TALK_DIR = os.path.join(BASE_DIR, "avatar_talk")
 # 角色檔案
 CH_JSON = os.path.join(CHARACTER_DIR, "1.json")   
 
+class GenerationCancelled(Exception):
+    """生成在片段邊界被取消"""
+
 # ========= 3) 全域變數和初始化 =========
 def _load_character_data():
     """載入角色資料"""
     with open(CH_JSON, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def character_id(character):
+    """角色識別碼（角色設定的雜湊值）；寫入每個回應，語音服務器依此選擇聲音並作為語音快取鍵的一部分"""
+    payload = json.dumps(character, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
 def _ensure_output_dir():
     """確保輸出資料夾存在"""
     os.makedirs(AVATAR_TALK_DIR, exist_ok=True)
 
 
 # ========= 4) 處理函數 =========
+def configure_limits(max_inflight=None, voice_inflight=None):
+    """調整全域的 LLM 與語音請求上限（需在開始生成前呼叫）"""
+    global MAX_INFLIGHT, VOICE_INFLIGHT, LLM_SLOTS, VOICE_SLOTS
+    if max_inflight:
+        MAX_INFLIGHT = max(1, int(max_inflight))
+        LLM_SLOTS = threading.BoundedSemaphore(MAX_INFLIGHT)
+    if voice_inflight:
+        VOICE_INFLIGHT = max(1, int(voice_inflight))
+        VOICE_SLOTS = threading.BoundedSemaphore(VOICE_INFLIGHT)
+
 def build_whole(captions: str, character: str) -> str:
     return (
         f"你扮演的角色:{character}\n"
@@ -50,77 +126,245 @@ def build_whole(captions: str, character: str) -> str:
         "15個字內、中文簡短回覆："
     )
 
-def process_video_subtitles(video_data, character_info, video_id=None):
-    """處理單個影片字幕檔案"""
-    time_per_summary = 60000
-    captions = []
-    llm_summary = []
-    stamp = ""
-    reply_count = 0
+def build_batch(captions_list, character: str) -> str:
+    """將多個連續片段放進同一個提示詞，要求依序輸出 JSON 字串陣列"""
+    lines = [
+        f"你扮演的角色:{character}\n",
+        f"依照扮演的角色、對於我提供的以下 {len(captions_list)} 段影片片段分別說出感想\n"
+    ]
+    for number, captions in enumerate(captions_list, start=1):
+        lines.append(f"片段{number}: {captions}\n")
+    lines.append(
+        f"請只輸出一個 JSON 陣列，依序包含 {len(captions_list)} 個字串，"
+        "每個字串是對應片段 15個字內、中文簡短回覆，例如 [\"回覆1\", \"回覆2\"]："
+    )
+    return "".join(lines)
+
+def _clean_reply(value):
+    """整理單個回覆，無效時返回 None"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().strip('"“”「」').strip()
+    return value or None
+
+def parse_batch_replies(text, count):
+    """解析批次回覆，返回長度為 count 的列表；無法解析的片段為 None"""
+    text = THINK_BLOCK.sub("", text or "").strip()
+    replies = [None] * count
+    
+    match = JSON_ARRAY.search(text)
+    if match:
+        try:
+            items = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            items = None
+        if isinstance(items, list) and len(items) == count:
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    item = item.get("reply") or item.get("Reply")
+                replies[index] = _clean_reply(item)
+            return replies
     
+    # 退而求其次：逐行解析編號格式
+    for number, reply in NUMBERED_LINE.findall(text):
+        index = int(number) - 1
+        if 0 <= index < count and replies[index] is None:
+            replies[index] = _clean_reply(reply)
+    return replies
+
+def segment_captions(content, time_per_summary=TIME_PER_SUMMARY):
+    """將字幕段落依影片時間切成視窗，返回 [{"time": 起始時間戳, "captions": [文字, ...], ...}]"""
+    return segment_windows(
+        content,
+        window_ms=time_per_summary,
+        min_speech_ms=MIN_SPEECH_MS,
+        gap_split_ms=GAP_SPLIT_MS
+    )
+
+def _chat(prompt):
+    """送出 LLM 請求（佔用一個全域名額），返回回覆文字"""
+    with LLM_SLOTS:
+        resp = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=False,
+            **LLM_PARAMS
+        )
+    return resp.choices[0].message.content
+
+def generate_reply(caption_text, character):
+    """為一個字幕視窗生成角色回復（優先使用快取）"""
+    prompt = build_whole(caption_text, str(character))
+    cache_key = ReplyCache.make_key(LLM_MODEL, prompt, character, LLM_PARAMS)
+    cached = reply_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    content_reply = _chat(prompt)
+    reply_text = THINK_BLOCK.sub("", content_reply).strip()
+    
+    reply_cache.put(cache_key, reply_text, {"model": LLM_MODEL})
+    return reply_text
+
+def generate_batch_replies(captions_list, character):
+    """在一個請求中為多個連續片段生成回復；解析失敗的片段改用單片段請求"""
+    if len(captions_list) == 1:
+        return [generate_reply(captions_list[0], character)]
+    
+    prompt = build_batch(captions_list, str(character))
+    cache_key = ReplyCache.make_key(LLM_MODEL, prompt, character, LLM_PARAMS)
+    replies = reply_cache.get(cache_key)
+    
+    if not isinstance(replies, list) or len(replies) != len(captions_list):
+        replies = parse_batch_replies(_chat(prompt), len(captions_list))
+        if all(reply is not None for reply in replies):
+            reply_cache.put(cache_key, replies, {"model": LLM_MODEL, "batch": len(captions_list)})
+    
+    missing = [index for index, reply in enumerate(replies) if reply is None]
+    if missing:
+        print(f"⚠️  批次回覆有 {len(missing)}/{len(captions_list)} 個片段無法解析，改為單獨請求")
+        for index in missing:
+            replies[index] = generate_reply(captions_list[index], character)
+    return replies
+
+def _segment_priority(segments, index, now_ms):
+    """播放中與之後的片段依時間先後優先，已播過的片段依距離由近到遠排在後面"""
+    start = segments[index]["time"] or 0
+    end = segments[index + 1]["time"] if index + 1 < len(segments) else float("inf")
+    if end > now_ms:
+        return (0, start)
+    return (1, now_ms - start)
+
+def _next_unit(segments, units, pending, current_time_fn):
+    """從待處理的請求單位中選出下一個要送出的單位"""
+    now_ms = current_time_fn() if current_time_fn else None
+    if now_ms is None:
+        return min(pending)
+    return min(pending, key=lambda unit: min(_segment_priority(segments, index, now_ms) for index in units[unit]))
+
+def process_video_subtitles(video_data, character_info, video_id=None, max_inflight=None,
+                            current_time_fn=None, on_progress=None, batch_size=None, journal_path=None,
+                            should_cancel=None):
+    """處理單個影片字幕檔案（先切分視窗，再並行送出 LLM 請求）
+    
+    Args:
+        current_time_fn (callable): 返回觀看者目前播放位置（毫秒）的函數；提供時優先生成即將播放的片段
+        on_progress (callable): 每批請求完成後以目前所有已完成的條目（依時間排序）呼叫一次
+        batch_size (int): 每個請求包含的連續片段數，預設為 MESSAGE_GEN_BATCH_SIZE
+        journal_path (str): 生成日誌路徑；提供時記錄每個完成的片段，並略過日誌中已完成的片段
+        should_cancel (callable): 返回 True 時不再送出新的片段（已送出的片段完成並記錄後拋出 GenerationCancelled）
+    """
     transcript_data = video_data.get("transcript_data", {})
     content = transcript_data.get("content", [])
     
     print(f"🎬 開始處理影片字幕，共 {len(content)} 個字幕段落")
     
-    for s in content:
-        _time = s.get("duration", 0)
-        text = s.get("text", "")
-        if stamp == "": stamp = s.get("offset", 0)
-        time_per_summary -= _time
-        
-        captions.append(text)
-        
-        if time_per_summary <= 0:
-            time_per_summary = 60000
-            reply_count += 1
-            print(f"💭 正在生成第 {reply_count} 個回復（時間戳: {stamp}ms）...")
-            
-            prompt = build_whole(str(captions), str(character_info[0]))
-            resp = client.chat.completions.create(
-                model="user.Roleplay-Llama-3-8B-i1-GGUF",
-                messages=[{"role": "user", "content": prompt}],
-                stream=False
-            )
-            content_reply = resp.choices[0].message.content
-            reply_text = THINK_BLOCK.sub("", content_reply).strip()
-            
-            print(f"✨ 角色回復 #{reply_count}: {reply_text}")
-            
-            captions.clear()
-            llm_summary.append({
-                "time": stamp,
-                "Reply": reply_text,
-                "is_generated": False,
-                "file_path": ""
-            })
-            stamp = ""
-    
-    # 處理剩餘的字幕
-    if len(captions) > 0:
-        reply_count += 1
-        print(f"💭 正在生成最後的回復（第 {reply_count} 個，時間戳: {stamp}ms）...")
-        
-        prompt = build_whole(str(captions), str(character_info[0]))
-        resp = client.chat.completions.create(
-            model="user.Roleplay-Llama-3-8B-i1-GGUF",
-            messages=[{"role": "user", "content": prompt}],
-            stream=False
-        )
-        content_reply = resp.choices[0].message.content
-        reply_text = THINK_BLOCK.sub("", content_reply).strip()
-        
-        print(f"✨ 角色回復 #{reply_count}: {reply_text}")
-        
-        llm_summary.append({
-            "time": stamp,
-            "Reply": reply_text,
-            "is_generated": False,
-            "file_path": ""
-        })
+    segments = segment_captions(content)
+    if not segments:
+        print("📝 完成處理，總共生成了 0 個角色回復")
+        return []
     
-    print(f"📝 完成處理，總共生成了 {reply_count} 個角色回復")
-    return llm_summary
+    # 合併、去重並依預算截斷每個片段的字幕文字
+    character = str(character_info[0])
+    voice_character = character_id(character_info[0])
+    raw_prompt_tokens = 0
+    prompt_tokens = 0
+    for number, segment in enumerate(segments, start=1):
+        segment["text"], stats = build_caption_text(segment["captions"], PROMPT_TOKEN_BUDGET)
+        raw = estimate_tokens(build_whole(str(segment["captions"]), character))
+        compact = estimate_tokens(build_whole(segment["text"], character))
+        raw_prompt_tokens += raw
+        prompt_tokens += compact
+        print(f"🧮 片段 #{number}: 提示詞約 {compact} tokens（原始 {raw}，"
+              f"保留 {stats['kept_fragments']}/{stats['fragments']} 段{'，已截斷' if stats['truncated'] else ''}）")
+    print(f"🧮 提示詞合計約 {prompt_tokens} tokens（原始 {raw_prompt_tokens}）")
+    
+    entries = [None] * len(segments)
+    
+    # 從生成日誌恢復已完成的片段
+    journal = None
+    if journal_path:
+        journal = GenerationJournal(journal_path, segments_signature(segments), len(segments))
+        restored = journal.load()
+        for index, entry in restored.items():
+            entries[index] = entry
+        if restored:
+            print(f"♻️  從生成日誌恢復 {len(restored)}/{len(segments)} 個片段")
+        journal.open(resume=bool(restored))
+    
+    # 每個請求單位包含 batch_size 個連續的待處理片段
+    remaining = [index for index, entry in enumerate(entries) if entry is None]
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    units = [remaining[start:start + batch_size] for start in range(0, len(remaining), batch_size)]
+    
+    max_workers = max(1, min(max_inflight or MAX_INFLIGHT, len(units)))
+    print(f"💭 共 {len(segments)} 個片段（{len(units)} 個請求，每個最多 {batch_size} 個片段），同時處理 {max_workers} 個請求...")
+    
+    completed = len(segments) - len(remaining)
+    pending = set(range(len(units)))
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="message-gen") as executor:
+        try:
+            while pending or running:
+                # 在片段邊界檢查是否已取消
+                if pending and should_cancel and should_cancel():
+                    print(f"🛑 生成已取消，等待 {len(running)} 個進行中的請求完成")
+                    pending.clear()
+                    error = error or GenerationCancelled(f"影片 {video_id} 的生成已取消")
+                    if not running:
+                        break
+                
+                # 每空出一個名額才挑選下一個單位，讓順序跟隨最新的播放位置
+                while pending and len(running) < max_workers:
+                    unit = _next_unit(segments, units, pending, current_time_fn)
+                    pending.discard(unit)
+                    captions_list = [segments[index]["text"] for index in units[unit]]
+                    future = executor.submit(generate_batch_replies, captions_list, character_info[0])
+                    running[future] = unit
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                finished = 0
+                for future in done:
+                    unit = running.pop(future)
+                    try:
+                        replies = future.result()
+                    except Exception as e:
+                        # 任一請求失敗時不再送出新請求，但仍記錄已送出請求的結果
+                        error = error or e
+                        pending.clear()
+                        continue
+                    for index, reply in zip(units[unit], replies):
+                        entries[index] = {
+                            "time": segments[index]["time"],
+                            "Reply": reply,
+                            "character": voice_character,
+                            "is_generated": False,
+                            "file_path": ""
+                        }
+                        completed += 1
+                        finished += 1
+                        print(f"✨ 角色回復 #{index + 1}（時間戳: {segments[index]['time']}ms，{completed}/{len(segments)}）: {reply}")
+                        if journal:
+                            journal.record(index, entries[index])
+                if finished and on_progress:
+                    on_progress([entry for entry in entries if entry is not None])
+        finally:
+            if journal:
+                journal.close()
+    
+    if error is not None:
+        raise error
+    
+    print(f"📝 完成處理，總共生成了 {len(entries)} 個角色回復")
+    return entries
+
+def _write_json_atomic(file_path, data):
+    """先寫入暫存檔再以 os.replace 取代，讀取端不會看到寫到一半的檔案"""
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, file_path)
 
 def send_voice_generation_request(video_id, llm_summary):
     """向語音生成服務器發送批次語音生成請求
@@ -144,12 +388,25 @@ def send_voice_generation_request(video_id, llm_summary):
         print(f"🎵 向語音生成服務器發送請求: 影片 {video_id}")
         logger.info(f"向語音生成服務器發送請求，影片ID: {video_id}")
         
-        # 發送 POST 請求
-        response = requests.post(
-            VOICE_GENERATION_SERVER_URL,
-            json=request_data,
-            timeout=30  # 30秒超時
-        )
+        # 發送 POST 請求（每次請求佔用一個全域語音請求名額；佇列已滿時釋放名額，依 Retry-After 等待後重試）
+        for attempt in range(VOICE_RETRY_ATTEMPTS + 1):
+            with VOICE_SLOTS:
+                response = requests.post(
+                    VOICE_GENERATION_SERVER_URL,
+                    json=request_data,
+                    timeout=30  # 30秒超時
+                )
+            if response.status_code != 429 or attempt == VOICE_RETRY_ATTEMPTS:
+                break
+            
+            try:
+                wait = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                wait = 2 ** attempt
+            wait = min(max(wait, 1), VOICE_RETRY_MAX_WAIT)
+            print(f"⏳ 語音生成服務器佇列已滿，{wait:.0f} 秒後重試 ({attempt + 1}/{VOICE_RETRY_ATTEMPTS})")
+            logger.warning(f"語音生成服務器佇列已滿，{wait:.0f} 秒後重試，影片ID: {video_id}")
+            time.sleep(wait)
         
         if response.status_code == 202:  # 202 Accepted
             result = response.json()
@@ -176,12 +433,14 @@ def send_voice_generation_request(video_id, llm_summary):
         logger.error(f"發送語音生成請求時發生錯誤: {e}")
         return False
 
-def generate_avatar_response_for_video(video_id, character_index=0):
+def generate_avatar_response_for_video(video_id, character_index=0, current_time_fn=None, should_cancel=None):
     """為指定影片 ID 生成角色回應
     
     Args:
         video_id (str): 影片 ID
         character_index (int): 角色索引，預設為 0 (第一位角色)
+        current_time_fn (callable): 返回觀看者目前播放位置（毫秒）的函數，用於決定生成順序
+        should_cancel (callable): 返回 True 時在下一個片段邊界停止（進度保留在生成日誌中）
     
     Returns:
         bool: 是否成功生成
@@ -210,9 +469,10 @@ def generate_avatar_response_for_video(video_id, character_index=0):
             logger.warning(f"字幕檔案不存在: {subtitle_file}")
             return False
         
-        # 檢查角色回應檔案是否已存在
+        # 檢查角色回應檔案是否已完成（仍有生成日誌表示上次中斷，需要繼續）
         output_file = os.path.join(AVATAR_TALK_DIR, f"{video_id}.json")
-        if os.path.exists(output_file):
+        journal_path = journal_path_for(output_file)
+        if os.path.exists(output_file) and not os.path.exists(journal_path):
             print(f"⚠️  角色回應檔案已存在，跳過處理: avatar_talk/{video_id}.json")
             logger.info(f"角色回應檔案已存在，跳過處理: {output_file}")
             return True
@@ -225,12 +485,18 @@ def generate_avatar_response_for_video(video_id, character_index=0):
         
         print(f"📖 成功載入字幕檔案")
         
-        # 處理字幕生成回應
-        llm_summary = process_video_subtitles(video_data, character_info, video_id)
+        # 處理字幕生成回應（每批請求完成就寫入檔案，播放端可立即讀到）
+        llm_summary = process_video_subtitles(
+            video_data, character_info, video_id,
+            current_time_fn=current_time_fn,
+            on_progress=lambda entries: _write_json_atomic(output_file, entries),
+            journal_path=journal_path,
+            should_cancel=should_cancel
+        )
         
-        # 儲存結果
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(llm_summary, f, ensure_ascii=False, indent=2)
+        # 儲存完整結果後才刪除生成日誌
+        _write_json_atomic(output_file, llm_summary)
+        remove_journal(journal_path)
         
         print(f"💾 結果已儲存到: avatar_talk/{video_id}.json")
         
@@ -247,16 +513,41 @@ def generate_avatar_response_for_video(video_id, character_index=0):
         logger.info(f"角色回應已生成並儲存到: {output_file}")
         return True
         
+    except GenerationCancelled as e:
+        print(f"🛑 {e}")
+        logger.info(f"{e}")
+        return False
     except Exception as e:
         print(f"❌ 處理影片 {video_id} 時發生錯誤: {e}")
         logger.error(f"生成角色回應時發生錯誤: {e}")
         return False
 
-def generate_avatar_responses_batch():
-    """批次處理所有影片字幕檔案生成角色回應"""
+def _timed_generate(video_id):
+    """生成單一影片並計時（批次處理用）"""
+    start_time = time.time()
+    success = generate_avatar_response_for_video(video_id)
+    return {
+        "video_id": video_id,
+        "success": success,
+        "elapsed": time.time() - start_time
+    }
+
+def generate_avatar_responses_batch(jobs=None, max_inflight=None, voice_inflight=None):
+    """批次處理所有影片字幕檔案生成角色回應
+    
+    Args:
+        jobs (int): 同時處理的影片數，預設為 MESSAGE_GEN_JOBS
+        max_inflight (int): 所有影片共用的 LLM 請求上限，預設為 MESSAGE_GEN_MAX_INFLIGHT
+        voice_inflight (int): 所有影片共用的語音請求上限，預設為 MESSAGE_GEN_VOICE_INFLIGHT
+    
+    Returns:
+        bool: 是否全部成功
+    """
     import logging
     logger = logging.getLogger(__name__)
     
+    configure_limits(max_inflight, voice_inflight)
+    jobs = max(1, jobs or JOBS)
     start_time = time.time()
     
     print("\n🔄 開始批次處理所有影片字幕檔案")
@@ -265,9 +556,6 @@ def generate_avatar_responses_batch():
     # 確保輸出資料夾存在
     _ensure_output_dir()
     
-    # 載入角色資料
-    character_info = _load_character_data()
-    
     # 取得所有影片字幕檔案
     subtitle_files = glob.glob(os.path.join(VIDEO_SUBTITLES_DIR, "*.json"))
     
@@ -275,53 +563,43 @@ def generate_avatar_responses_batch():
     logger.info(f"找到 {len(subtitle_files)} 個影片字幕檔案")
     
     success_count = 0
-    
+    video_ids = []
     for subtitle_file in subtitle_files:
-        try:
-            logger.info(f"處理檔案: {subtitle_file}")
-            
-            # 取得檔案名稱（不包含副檔名）作為 video ID
-            video_id = os.path.splitext(os.path.basename(subtitle_file))[0]
-            
-            # 檢查角色回應檔案是否已存在
-            output_file = os.path.join(AVATAR_TALK_DIR, f"{video_id}.json")
-            if os.path.exists(output_file):
-                print(f"⚠️  影片 {video_id} 的角色回應檔案已存在，跳過處理")
-                logger.info(f"角色回應檔案已存在，跳過處理: {output_file}")
-                success_count += 1  # 視為成功，因為檔案已存在
-                continue
-            
-            # 讀取影片字幕資料
-            with open(subtitle_file, "r", encoding="utf-8") as f:
-                video_data = json.load(f)
-            
-            # 處理這個影片的字幕
-            print(f"\n🎯 處理影片: {video_id}")
-            llm_summary = process_video_subtitles(video_data, character_info, video_id)
-            
-            # 儲存結果
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(llm_summary, f, ensure_ascii=False, indent=2)
-            
-            print(f"💾 已儲存到: avatar_talk/{video_id}.json")
-            logger.info(f"已儲存到: {output_file}")
-            
-            # 向語音生成服務器發送請求
-            voice_success = send_voice_generation_request(video_id, llm_summary)
-            if voice_success:
-                print(f"🎵 已向語音生成服務器發送請求")
-            else:
-                print(f"⚠️  語音生成請求發送失敗")
-            
-            success_count += 1
-            
-        except Exception as e:
-            print(f"❌ 處理檔案 {subtitle_file} 時發生錯誤: {e}")
-            logger.error(f"處理檔案 {subtitle_file} 時發生錯誤: {e}")
+        # 取得檔案名稱（不包含副檔名）作為 video ID
+        video_id = os.path.splitext(os.path.basename(subtitle_file))[0]
+        
+        # 檢查角色回應檔案是否已完成（仍有生成日誌表示上次中斷，需要繼續）
+        output_file = os.path.join(AVATAR_TALK_DIR, f"{video_id}.json")
+        if os.path.exists(output_file) and not os.path.exists(journal_path_for(output_file)):
+            print(f"⚠️  影片 {video_id} 的角色回應檔案已存在，跳過處理")
+            logger.info(f"角色回應檔案已存在，跳過處理: {output_file}")
+            success_count += 1  # 視為成功，因為檔案已存在
+            continue
+        video_ids.append(video_id)
+    
+    print(f"🚀 待處理 {len(video_ids)} 個影片：同時 {jobs} 個影片，LLM 請求上限 {MAX_INFLIGHT}，語音請求上限 {VOICE_INFLIGHT}")
+    
+    results = []
+    if video_ids:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(video_ids)), thread_name_prefix="message-gen-video") as executor:
+            futures = [executor.submit(_timed_generate, video_id) for video_id in video_ids]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"❌ 批次處理時發生錯誤: {e}")
+                    logger.error(f"批次處理時發生錯誤: {e}")
     
+    success_count += sum(1 for result in results if result["success"])
     elapsed = time.time() - start_time
+    
     print("="*60)
     print(f"🏁 批次處理完成！")
+    if results:
+        print("⏱️  各影片耗時：")
+        for result in sorted(results, key=lambda r: r["elapsed"], reverse=True):
+            status = "✅" if result["success"] else "❌"
+            print(f"   {status} {result['video_id']}: {result['elapsed']:.2f} 秒")
     print(f"✅ 成功處理: {success_count}/{len(subtitle_files)} 個檔案")
     print(f"⏱️  總時間: {elapsed:.2f} 秒")
     print("="*60)
@@ -333,11 +611,19 @@ def generate_avatar_responses_batch():
 # ========= 5) 主程式部分 =========
 if __name__ == "__main__":
     # 當作為獨立腳本執行時
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="為影片字幕生成角色回應")
+    parser.add_argument("video_id", nargs="?", help="只處理指定的影片 ID；省略時批次處理所有影片")
+    parser.add_argument("--jobs", type=int, default=None, help=f"同時處理的影片數（預設 {JOBS}）")
+    parser.add_argument("--max-inflight", type=int, default=None, help=f"所有影片共用的 LLM 請求上限（預設 {MAX_INFLIGHT}）")
+    parser.add_argument("--voice-inflight", type=int, default=None, help=f"所有影片共用的語音請求上限（預設 {VOICE_INFLIGHT}）")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1:
+    if args.video_id:
         # 如果提供了 video ID 參數，只處理該影片
-        video_id = sys.argv[1]
+        video_id = args.video_id
+        configure_limits(args.max_inflight, args.voice_inflight)
         print(f"處理指定影片: {video_id}")
         success = generate_avatar_response_for_video(video_id)
         if success:
@@ -347,7 +633,7 @@ if __name__ == "__main__":
     else:
         # 否則批次處理所有影片
         print("開始批次處理所有影片...")
-        success = generate_avatar_responses_batch()
+        success = generate_avatar_responses_batch(args.jobs, args.max_inflight, args.voice_inflight)
         if success:
             print("所有影片處理完成")
         else:
@@ -0,0 +1,123 @@
+"""
+字幕提示詞建構
+將一個時間視窗內的字幕片段去重、去除贅詞後合併成精簡文字，並依 token 預算截斷
+"""
+
+import math
+import re
+
+# 中日韓文字（每個字約一個 token）
+CJK_CHAR = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+LATIN_WORD = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)*")
+OTHER_CHAR = re.compile(r"[^\sA-Za-z0-9\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+# 字幕中常見的音效/舞台標註；只移除這些已知標籤，其他括號內容（例如 (2024)）保留
+ANNOTATION_TAGS = (
+    "music", "applause", "laughter", "laughing", "laughs", "cheering", "cheers",
+    "inaudible", "silence", "noise", "background music", "music playing",
+    "音樂", "音乐", "音楽", "掌聲", "掌声", "拍手", "笑", "笑聲", "笑声", "歓声", "歡呼", "欢呼",
+)
+# 例如 [Music]、(笑)、【音樂】、♪、>>
+ANNOTATION = re.compile(
+    r"[\[(（【]\s*(?:" + "|".join(re.escape(tag) for tag in ANNOTATION_TAGS) + r")\s*[\])）】]|[♪♫]+|>>+",
+    flags=re.IGNORECASE
+)
+# 英文贅詞（整個單字，只處理真正的口吃/停頓詞）
+LATIN_FILLER = re.compile(r"\b(?:um+|uh+|erm+)\b[,，]?\s*", flags=re.IGNORECASE)
+# 中文贅詞（片段開頭或獨立出現）
+CJK_FILLER = re.compile(r"^(?:嗯+|呃+|啊+|欸+|那個)[，,。、\s]*")
+
+# 片段重疊去除時最少的重疊字元數
+MIN_OVERLAP = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 數（不依賴模型 tokenizer）：中日韓每字 1、英數每 4 字元 1、其他符號 1"""
+    if not text:
+        return 0
+    cjk = len(CJK_CHAR.findall(text))
+    latin = sum(math.ceil(len(word) / 4) for word in LATIN_WORD.findall(text))
+    other = len(OTHER_CHAR.findall(text))
+    return cjk + latin + other
+
+
+def clean_fragment(text: str) -> str:
+    """去除標註與贅詞、合併空白"""
+    text = ANNOTATION.sub(" ", text or "")
+    text = LATIN_FILLER.sub("", text)
+    text = " ".join(text.split())
+    return CJK_FILLER.sub("", text).strip()
+
+
+def _strip_overlap(previous: str, current: str) -> str:
+    """自動字幕常重複上一段的結尾，去除 current 開頭與 previous 結尾重疊的部分"""
+    if current in previous:
+        return ""
+    for size in range(min(len(previous), len(current)) - 1, MIN_OVERLAP - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+
+def compact_captions(captions) -> list:
+    """清理並去重字幕片段，返回保留的片段"""
+    fragments = []
+    for caption in captions:
+        fragment = clean_fragment(caption)
+        if fragments and fragment:
+            # 逐步增長的字幕（新片段以上一段開頭）只保留較長的版本
+            if fragment.startswith(fragments[-1]):
+                fragments[-1] = fragment
+                continue
+            fragment = _strip_overlap(fragments[-1], fragment)
+        if fragment:
+            fragments.append(fragment)
+    return fragments
+
+
+def _join(fragments) -> str:
+    """合併片段；中日韓文字之間不加空白"""
+    text = ""
+    for fragment in fragments:
+        if text and not (CJK_CHAR.match(text[-1]) and CJK_CHAR.match(fragment[0])):
+            text += " "
+        text += fragment
+    return text
+
+
+def build_caption_text(captions, token_budget=None):
+    """將視窗內的字幕片段轉為精簡文字
+
+    Args:
+        captions (list): 原始字幕片段
+        token_budget (int): 字幕文字的 token 上限，None 或 0 表示不限制
+
+    Returns:
+        tuple: (字幕文字, 統計 {fragments, kept_fragments, raw_tokens, tokens, truncated})
+    """
+    fragments = compact_captions(captions)
+    kept = []
+    tokens = 0
+    truncated = False
+
+    for fragment in fragments:
+        fragment_tokens = estimate_tokens(fragment)
+        if token_budget and tokens + fragment_tokens > token_budget:
+            truncated = True
+            # 第一個片段就超過預算時截斷該片段
+            if not kept:
+                while len(fragment) > 1 and estimate_tokens(fragment) > token_budget:
+                    fragment = fragment[:len(fragment) * 9 // 10]
+                kept.append(fragment)
+            break
+        kept.append(fragment)
+        tokens += fragment_tokens
+
+    text = _join(kept)
+    return text, {
+        "fragments": len(captions),
+        "kept_fragments": len(kept),
+        "raw_tokens": estimate_tokens(str(list(captions))),
+        "tokens": estimate_tokens(text),
+        "truncated": truncated
+    }
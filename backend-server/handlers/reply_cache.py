@@ -0,0 +1,147 @@
+"""
+LLM 回應快取
+以 (模型, 提示詞, 角色設定, 採樣參數) 的雜湊值為鍵，將角色回復存放在磁碟上，超過容量上限時移除最久未使用的項目
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyCache:
+    """內容定址的磁碟回應快取（LRU 依檔案 mtime 判斷）"""
+
+    def __init__(self, cache_dir, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次寫入時掃描目錄計算
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model, prompt, character, params=None):
+        """計算快取鍵"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "character": character, "params": params or {}},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """讀取快取的回復，沒有時返回 None"""
+        file_path = self._path(key)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                reply = json.load(f).get("reply")
+        except (OSError, json.JSONDecodeError, AttributeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # 更新 mtime 作為最近使用時間
+        try:
+            os.utime(file_path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return reply
+
+    def put(self, key, reply, metadata=None):
+        """寫入回復（原子寫入），必要時淘汰舊項目"""
+        file_path = self._path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        data = json.dumps(
+            {"reply": reply, "metadata": metadata or {}, "created_at": time.time()},
+            ensure_ascii=False
+        ).encode("utf-8")
+
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            previous_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, file_path)
+        except OSError as e:
+            logger.warning(f"Failed to write reply cache entry {key}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self.writes += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def statistics(self):
+        """獲取快取統計"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            return {
+                "cache_dir": self.cache_dir,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions
+            }
+
+    def _path(self, key):
+        """快取檔案路徑（以前兩碼分目錄，避免單一目錄檔案過多）"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """列出所有快取檔案 (mtime, size, path)"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        """計算快取目錄總大小（呼叫端需持有鎖）"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """移除最久未使用的項目，直到低於上限的 90%（呼叫端需持有鎖）"""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries())
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+        logger.debug(f"Reply cache evicted down to {self._total_bytes} bytes")
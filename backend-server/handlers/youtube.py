@@ -8,11 +8,18 @@ import logging
 import json
 import os
 import threading
-import time
 import requests
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from services.generation_jobs import GenerationJobQueue
+from services.subtitle_search import SubtitleSearchIndex
+from services.subtitle_store import SubtitleStore
+from services.tab_tracker import TabTracker
+from services.transcript_fetcher import TranscriptFetcher, PRIORITY_HIGH, PRIORITY_NORMAL
+from services.transcript_timeline import TranscriptTimelineIndex
+from services.watch_stats import WatchStatsAggregator
+
 logger = logging.getLogger(__name__)
 
 # 導入角色回應生成功能
@@ -32,13 +39,21 @@ class YouTubeHandler:
         self.current_data = None
         self.data_history = []
         self.max_history = 100
+        self.watch_stats = WatchStatsAggregator()  # 增量觀看統計（不受歷史上限影響）
         self.subscribers = []  # 訂閱者列表，用於實時通知
-        self.active_tabs = {}  # 存儲活動標籤頁信息 {tab_id: tab_info}
-        self.youtube_tabs = set()  # 存儲 YouTube 標籤頁 ID
         
-        # 字幕相關數據存儲
-        self.subtitle_history = []  # 字幕歷史記錄
-        self.max_subtitle_history = 200  # 最大字幕歷史記錄數量
+        # 標籤頁存活追蹤（超過 5 秒沒有更新即到期）
+        self.tab_tracker = TabTracker(ttl_seconds=5.0, on_expire=self._on_tab_expired)
+        self.active_tabs = self.tab_tracker.active_tabs  # 存儲活動標籤頁信息 {tab_id: tab_info}
+        self.youtube_tabs = self.tab_tracker.youtube_tabs  # 存儲 YouTube 標籤頁 ID
+        
+        # 批次/增量上報：每個標籤頁的最新完整狀態與序號 {tab_id: {'seq': int, 'data': dict}}
+        self.tab_frames = {}
+        self._tab_frames_lock = threading.Lock()
+        
+        # 字幕相關數據存儲（依 video_id 分組，即時字幕與 API 轉錄分開存放）
+        self.max_subtitle_history = 200  # 每個影片最大字幕歷史記錄數量
+        self.subtitle_store = SubtitleStore(max_captions_per_video=self.max_subtitle_history)
         self.current_subtitles = None  # 當前字幕信息
         
         # Supadata API 相關設定
@@ -47,14 +62,30 @@ class YouTubeHandler:
         self.processed_fullscreen_videos = set()  # 避免重複處理同一個視頻
         self.last_mode_state = {}  # 記錄上次的模式狀態
         
+        # 轉錄擷取工作池（固定執行緒數、同一影片合併請求、失敗時退避重試）
+        self.transcript_fetcher = TranscriptFetcher(
+            self._call_supadata_api,
+            on_success=self._handle_transcript_fetched,
+            on_failure=self._handle_transcript_failed,
+            workers=2
+        )
+        
         # 設定字幕檔案存儲路徑 - 指向 windows-app/src/data/video_subtitles
         self.subtitles_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'windows-app', 'src', 'data', 'video_subtitles')
         self._ensure_subtitles_dir_exists()
         
-        # 啟動監控線程
-        self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self._monitor_tabs, daemon=True)
-        self.monitor_thread.start()
+        # 所有已儲存轉錄的全文搜尋索引（首次搜尋時建立，之後增量更新）
+        self.search_index = SubtitleSearchIndex(self.subtitles_dir)
+        
+        # 轉錄時間軸索引（依播放時間查詢片段）
+        self.timeline_index = TranscriptTimelineIndex(self.subtitles_dir)
+        
+        # 角色回應生成工作佇列（正在播放的影片優先）
+        self.generation_jobs = GenerationJobQueue(
+            self._run_generation_job,
+            current_video_fn=self.get_current_video_id,
+            workers=2
+        )
         
         logger.info("YouTube Handler initialized with tab monitoring and subtitle support")
     
@@ -75,17 +106,19 @@ class YouTubeHandler:
             # 更新標籤頁信息
             tab_id = data.get('tabId')
             if tab_id:
-                self.active_tabs[tab_id] = {
+                self.tab_tracker.touch(tab_id, {
                     'url': data.get('url'),
                     'title': data.get('title'),
                     'last_update': datetime.now(),
                     'is_youtube': True
-                }
-                self.youtube_tabs.add(tab_id)
+                })
             
             # 更新當前數據
             self.current_data = data
             
+            # 增量更新觀看統計
+            self.watch_stats.update(data)
+            
             # 檢測全螢幕或影劇模式並處理轉錄
             self._check_and_handle_special_modes(data)
             
@@ -116,6 +149,96 @@ class YouTubeHandler:
                 "error": str(e)
             }
     
+    def ingest_batch(self, frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批次接收 YouTube 數據幀（支援完整幀與增量幀）
+        
+        每個幀格式:
+            {"tabId": 1, "seq": 8, "kind": "full", "data": {...}}
+            {"tabId": 1, "seq": 9, "kind": "delta", "base": 8, "data": {變更欄位}, "removed": [欄位]}
+        
+        增量幀必須基於伺服器目前記錄的序號，否則該標籤頁會被要求重送完整幀（resync）。
+        acks 只包含成功處理的幀；處理失敗的幀序號列在 rejected_seqs。
+        """
+        accepted = 0
+        duplicates = 0
+        rejected = 0
+        resync = set()
+        acks = {}
+        rejected_seqs = {}
+        
+        for frame in frames:
+            tab_id = frame.get('tabId') if isinstance(frame, dict) else None
+            seq = frame.get('seq') if isinstance(frame, dict) else None
+            
+            if tab_id is None or not isinstance(seq, int) or not isinstance(frame.get('data'), dict):
+                rejected += 1
+                continue
+            
+            if tab_id in resync:
+                if frame.get('kind', 'full') != 'full':
+                    # 同一批次中序號已斷開，後續增量幀無法套用
+                    rejected += 1
+                    continue
+                # 完整幀重新建立狀態，不再需要重送
+                resync.discard(tab_id)
+            
+            merged = self._merge_frame(tab_id, seq, frame)
+            if merged is None:
+                duplicates += 1
+                continue
+            if merged is False:
+                resync.add(tab_id)
+                rejected += 1
+                continue
+            
+            # 以合併後的完整狀態走原本的處理流程
+            result = self.update_youtube_data(dict(merged, tabId=tab_id))
+            if result.get('success'):
+                accepted += 1
+                acks[str(tab_id)] = seq
+            else:
+                rejected += 1
+                rejected_seqs.setdefault(str(tab_id), []).append(seq)
+        
+        return {
+            "success": True,
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "resync": sorted(resync, key=str),
+            "acks": acks,
+            "rejected_seqs": rejected_seqs,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _merge_frame(self, tab_id: Any, seq: int, frame: Dict[str, Any]):
+        """將幀合併到標籤頁狀態；返回合併後狀態、None（重複幀）或 False（需要重送完整幀）"""
+        with self._tab_frames_lock:
+            state = self.tab_frames.get(tab_id)
+            
+            if frame.get('kind', 'full') == 'full':
+                # 完整幀一律視為權威狀態（擴展重啟後序號可能歸零）
+                state = {'seq': seq, 'data': dict(frame['data'])}
+                self.tab_frames[tab_id] = state
+                return dict(state['data'])
+            
+            if state is None:
+                return False
+            if seq <= state['seq']:
+                return None
+            
+            base = frame.get('base', seq - 1)
+            if base != state['seq']:
+                logger.debug(f"Delta frame gap for tab {tab_id}: base={base}, server seq={state['seq']}")
+                del self.tab_frames[tab_id]
+                return False
+            
+            state['data'].update(frame['data'])
+            for key in frame.get('removed') or []:
+                state['data'].pop(key, None)
+            state['seq'] = seq
+            return dict(state['data'])
+    
     def get_current_data(self) -> Optional[Dict[str, Any]]:
         """獲取當前 YouTube 數據"""
         return self.current_data
@@ -152,39 +275,11 @@ class YouTubeHandler:
         
         return summary
     
-    def get_watching_statistics(self) -> Dict[str, Any]:
+    def get_watching_statistics(self, include_videos: bool = True) -> Dict[str, Any]:
         """獲取觀看統計信息"""
-        if not self.data_history:
-            return {
-                "total_videos": 0,
-                "total_watch_time": 0,
-                "sessions": 0
-            }
-        
-        # 分析歷史數據
-        videos = set()
-        total_time = 0
-        sessions = 0
-        current_session_start = None
-        
-        for entry in self.data_history:
-            video_id = entry.get("videoId")
-            if video_id:
-                videos.add(video_id)
-            
-            # 簡單的會話計算
-            if entry.get("isPlaying") and current_session_start is None:
-                current_session_start = entry.get("timestamp")
-                sessions += 1
-            elif not entry.get("isPlaying") and current_session_start:
-                current_session_start = None
-        
-        return {
-            "total_videos": len(videos),
-            "total_watch_time": total_time,
-            "sessions": sessions,
-            "history_entries": len(self.data_history)
-        }
+        stats = self.watch_stats.snapshot(include_videos)
+        stats["history_entries"] = len(self.data_history)
+        return stats
     
     def subscribe_to_updates(self, callback):
         """訂閱數據更新通知"""
@@ -203,9 +298,8 @@ class YouTubeHandler:
         # 處理來自擴展的停止監控請求
         if self.current_data and self.current_data.get('tabId'):
             tab_id = self.current_data.get('tabId')
-            if tab_id in self.active_tabs:
-                del self.active_tabs[tab_id]
-            self.youtube_tabs.discard(tab_id)
+            self.tab_tracker.remove(tab_id)
+            self._forget_tab_state(tab_id)
         
         self.current_data = None
         logger.info("YouTube monitoring stopped")
@@ -218,9 +312,9 @@ class YouTubeHandler:
     
     def shutdown(self):
         """關閉監控器"""
-        self.monitoring = False
-        if self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=2)
+        self.tab_tracker.stop()
+        self.transcript_fetcher.shutdown()
+        self.generation_jobs.shutdown()
         logger.info("YouTube Handler shutdown completed")
     
     def _validate_data(self, data: Dict[str, Any]) -> bool:
@@ -294,47 +388,21 @@ class YouTubeHandler:
             "export_time": datetime.now().isoformat()
         }
     
-    def _monitor_tabs(self):
-        """監控標籤頁數量的後台線程"""
-        while self.monitoring:
-            try:
-                # 清理過期的標籤頁（超過5秒沒有更新的）
-                current_time = datetime.now()
-                expired_tabs = []
-                
-                for tab_id, tab_info in list(self.active_tabs.items()):
-                    if (current_time - tab_info['last_update']).total_seconds() > 5:
-                        expired_tabs.append(tab_id)
-                
-                for tab_id in expired_tabs:
-                    del self.active_tabs[tab_id]
-                    self.youtube_tabs.discard(tab_id)
-                
-                # 統計標籤頁數量
-                total_tabs = len(self.active_tabs)
-                youtube_tabs = len(self.youtube_tabs)
-                
-                # 輸出標籤頁統計
-                if total_tabs > 0:
-                    if youtube_tabs > 0:
-                        print(f"🔍 [TAB MONITOR] 總標籤頁: {total_tabs} | 🎬 YouTube 標籤頁: {youtube_tabs}")
-                        
-                        # 詳細顯示 YouTube 標籤頁信息
-                        for tab_id in self.youtube_tabs:
-                            if tab_id in self.active_tabs:
-                                tab_info = self.active_tabs[tab_id]
-                                title = tab_info.get('title', 'Unknown Title')[:50]
-                                print(f"  📺 Tab {tab_id}: {title}...")
-                    else:
-                        print(f"🔍 [TAB MONITOR] 總標籤頁: {total_tabs} | YouTube 標籤頁: 0")
-                else:
-                    print("🔍 [TAB MONITOR] 沒有活動的標籤頁")
-                
-                time.sleep(1)  # 每秒檢查一次
-                
-            except Exception as e:
-                logger.error(f"Tab monitoring error: {e}")
-                time.sleep(1)
+    def _on_tab_expired(self, tab_id: Any):
+        """標籤頁到期（超過存活時間沒有更新）時清理其狀態"""
+        self._forget_tab_state(tab_id)
+    
+    def _forget_tab_state(self, tab_id: Any):
+        """清除標籤頁的增量上報狀態與進行中的觀看會話"""
+        self.watch_stats.forget_tab(tab_id)
+        with self._tab_frames_lock:
+            self.tab_frames.pop(tab_id, None)
+    
+    def get_tab_info(self) -> Dict[str, Any]:
+        """獲取標籤頁資訊與存活追蹤統計"""
+        tab_info = self.tab_tracker.snapshot()
+        tab_info["monitor"] = self.tab_tracker.statistics()
+        return tab_info
     
     def update_tab_stats(self, tab_data: Dict[str, Any]):
         """更新來自 Chrome 擴展的標籤頁統計"""
@@ -348,18 +416,24 @@ class YouTubeHandler:
                 for tab in tab_data['tabs']:
                     tab_id = tab.get('id')
                     if tab_id and tab.get('isYoutube'):
-                        self.active_tabs[tab_id] = {
+                        self.tab_tracker.touch(tab_id, {
                             'url': tab.get('url'),
                             'title': tab.get('title'),
                             'last_update': current_time,
                             'is_youtube': True,
                             'active': tab.get('active', False)
-                        }
-                        self.youtube_tabs.add(tab_id)
+                        })
             
         except Exception as e:
             logger.error(f"Error updating tab stats: {e}")
     
+    def get_playback_time_ms(self, video_id: str) -> Optional[float]:
+        """獲取觀看者在指定影片的目前播放位置（毫秒），不是正在觀看的影片時返回 None"""
+        data = self.current_data
+        if not data or data.get('videoId') != video_id:
+            return None
+        return float(data.get('currentTime') or 0) * 1000
+    
     def get_current_video_id(self) -> Optional[str]:
         """獲取當前活動視頻的ID"""
         if not self.current_data:
@@ -403,33 +477,13 @@ class YouTubeHandler:
                     'end_time': current_text.get('endTime')
                 }
                 
-                # 避免重複添加相同的字幕
-                if not self._is_duplicate_subtitle(subtitle_entry):
-                    self.subtitle_history.append(subtitle_entry)
-                    
-                    # 限制歷史記錄數量
-                    if len(self.subtitle_history) > self.max_subtitle_history:
-                        self.subtitle_history.pop(0)
-                    
+                # 避免重複添加相同的字幕（每個影片的容器自行限制數量）
+                if self.subtitle_store.add_caption(subtitle_entry):
                     logger.debug(f"New subtitle: {current_text.get('text', '')[:50]}...")
             
         except Exception as e:
             logger.error(f"Error processing subtitle data: {e}")
     
-    def _is_duplicate_subtitle(self, new_entry: Dict[str, Any]) -> bool:
-        """檢查是否為重複的字幕條目"""
-        if not self.subtitle_history:
-            return False
-        
-        last_entry = self.subtitle_history[-1]
-        
-        # 如果是同一個視頻且文本相同，則認為是重複
-        return (
-            last_entry.get('video_id') == new_entry.get('video_id') and
-            last_entry.get('text') == new_entry.get('text') and
-            abs(last_entry.get('video_time', 0) - new_entry.get('video_time', 0)) < 2
-        )
-    
     def get_current_subtitles(self) -> Optional[Dict[str, Any]]:
         """獲取當前字幕信息"""
         return self.current_subtitles
@@ -440,13 +494,11 @@ class YouTubeHandler:
         if video_id is None:
             video_id = self.get_current_video_id()
         
-        history = self.subtitle_history
-        
-        # 如果有視頻ID，則篩選
+        # 如果有視頻ID，直接取該影片的容器
         if video_id:
-            history = [entry for entry in history if entry.get('video_id') == video_id]
+            return self.subtitle_store.get_captions(video_id, limit)
         
-        return history[-limit:]
+        return self.subtitle_store.get_all_captions(limit)
     
     def get_subtitle_transcript(self, video_id: Optional[str] = None) -> Dict[str, Any]:
         """獲取完整的字幕轉錄文本"""
@@ -485,78 +537,47 @@ class YouTubeHandler:
             "duration_covered": f"{int(history[0].get('video_time', 0))}s - {int(history[-1].get('video_time', 0))}s" if history else "0s"
         }
     
-    def search_subtitles(self, query: str, video_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """在字幕中搜索關鍵字"""
-        # 如果沒有指定video_id，使用當前視頻ID
-        if video_id is None:
-            video_id = self.get_current_video_id()
-            
-        results = []
-        history = self.get_subtitle_history(video_id, limit=self.max_subtitle_history)
-        
+    def search_subtitles(self, query: str, video_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """在所有已儲存的轉錄中搜索關鍵字，並附上當前視頻的即時字幕結果"""
+        # 即時字幕：只掃描指定（或當前）視頻的有界容器
+        caption_video_id = video_id or self.get_current_video_id()
         query_lower = query.lower()
         
-        for entry in history:
-            text = entry.get('text', '')
+        live_results = []
+        for entry in self.get_subtitle_history(caption_video_id, limit=self.max_subtitle_history):
+            text = entry.get('text') or ''
             if query_lower in text.lower():
-                results.append({
+                live_results.append({
                     'video_id': entry.get('video_id'),
                     'video_title': entry.get('video_title'),
                     'text': text,
                     'video_time': entry.get('video_time'),
                     'timestamp': entry.get('timestamp'),
-                    'track': entry.get('track')
+                    'track': entry.get('track'),
+                    'source': 'live_caption'
                 })
         
-        return results
+        # 轉錄片段：倒排索引查詢（未指定 video_id 時搜尋整個語料庫），與即時字幕合併後再套用 limit
+        results = self.search_index.search(query, video_id=video_id, limit=limit)
+        return (results + live_results)[:limit]
     
     def clear_subtitle_history(self, video_id: Optional[str] = None):
         """清除字幕歷史記錄"""
         if video_id:
             # 清除指定視頻的字幕記錄
-            self.subtitle_history = [
-                entry for entry in self.subtitle_history 
-                if entry.get('video_id') != video_id
-            ]
+            self.subtitle_store.clear(video_id)
             logger.info(f"Cleared subtitle history for video: {video_id}")
         else:
             # 清除所有字幕記錄
-            self.subtitle_history.clear()
+            self.subtitle_store.clear()
             self.current_subtitles = None
             logger.info("Cleared all subtitle history")
     
     def get_subtitle_statistics(self) -> Dict[str, Any]:
         """獲取字幕統計信息"""
-        if not self.subtitle_history:
-            return {
-                "total_entries": 0,
-                "unique_videos": 0,
-                "languages": [],
-                "total_characters": 0
-            }
-        
-        unique_videos = set()
-        languages = set()
-        total_chars = 0
-        
-        for entry in self.subtitle_history:
-            if entry.get('video_id'):
-                unique_videos.add(entry.get('video_id'))
-            
-            track = entry.get('track')
-            if track and track.get('language'):
-                languages.add(track.get('language'))
-            
-            text = entry.get('text', '')
-            total_chars += len(text)
-        
-        return {
-            "total_entries": len(self.subtitle_history),
-            "unique_videos": len(unique_videos),
-            "languages": list(languages),
-            "total_characters": total_chars,
-            "current_subtitle_available": self.current_subtitles is not None
-        }
+        stats = self.subtitle_store.statistics()
+        stats["current_subtitle_available"] = self.current_subtitles is not None
+        return stats
     
     def get_current_video_subtitle_count(self) -> Dict[str, Any]:
         """獲取當前視頻的字幕數量統計"""
@@ -575,10 +596,7 @@ class YouTubeHandler:
                 }
             
             # 統計歷史字幕條目數量
-            history_count = len([
-                entry for entry in self.subtitle_history 
-                if entry.get('video_id') == current_video_id
-            ])
+            history_count = self.subtitle_store.count_captions(current_video_id)
             
             # 獲取當前視頻信息
             video_title = None
@@ -643,41 +661,45 @@ class YouTubeHandler:
                     self.processed_fullscreen_videos.add(video_id)
                     return
                 
-                # 標記為已處理，避免重複
+                # 標記為已處理，避免重複（最終失敗時會移除以便之後重新觸發）
                 self.processed_fullscreen_videos.add(video_id)
                 
-                # 在後台線程中處理轉錄，避免阻塞主線程
-                threading.Thread(
-                    target=self._process_video_transcript,
-                    args=(video_url, video_id),
-                    daemon=True
-                ).start()
+                # 交給轉錄擷取工作池處理，避免阻塞主線程
+                self.request_transcript(video_id, video_url, PRIORITY_NORMAL)
                 
         except Exception as e:
             logger.error(f"Error in _check_and_handle_special_modes: {e}")
     
-    def _process_video_transcript(self, video_url: str, video_id: str):
-        """處理視頻轉錄（在後台線程中運行）"""
-        try:
-            logger.info(f"Starting transcript processing for video: {video_id}")
-            
-            # 調用 Supadata API
-            transcript_result = self._call_supadata_api(video_url)
-            
-            if transcript_result.get('success'):
-                logger.info(f"Successfully retrieved transcript for video: {video_id}")
-                
-                # 將轉錄結果存儲到字幕歷史中
-                self._store_transcript_result(video_id, video_url, transcript_result)
-                
-                # 通知訂閱者有新的轉錄數據
-                self._notify_transcript_update(video_id, transcript_result)
-                
-            else:
-                logger.warning(f"Failed to retrieve transcript for video {video_id}: {transcript_result.get('error')}")
-                
-        except Exception as e:
-            logger.error(f"Error processing video transcript for {video_id}: {e}")
+    def request_transcript(self, video_id: str, video_url: str, priority: int = PRIORITY_HIGH) -> Dict[str, Any]:
+        """提交轉錄擷取工作，返回工作狀態"""
+        logger.info(f"Queueing transcript processing for video: {video_id}")
+        return self.transcript_fetcher.submit(video_id, video_url, priority)
+    
+    def get_transcript_job(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """獲取影片的轉錄擷取工作狀態"""
+        return self.transcript_fetcher.get_job(video_id)
+    
+    def get_transcript_jobs(self) -> Dict[str, Any]:
+        """獲取所有轉錄擷取工作與工作池統計"""
+        return {
+            "jobs": self.transcript_fetcher.list_jobs(),
+            "statistics": self.transcript_fetcher.statistics()
+        }
+    
+    def _handle_transcript_fetched(self, video_id: str, video_url: str, transcript_result: Dict[str, Any]):
+        """轉錄擷取成功（在工作執行緒中運行）"""
+        logger.info(f"Successfully retrieved transcript for video: {video_id}")
+        
+        # 將轉錄結果存儲到字幕歷史中
+        self._store_transcript_result(video_id, video_url, transcript_result)
+        
+        # 通知訂閱者有新的轉錄數據
+        self._notify_transcript_update(video_id, transcript_result)
+    
+    def _handle_transcript_failed(self, video_id: str, video_url: str, transcript_result: Dict[str, Any]):
+        """轉錄擷取最終失敗，允許之後再次進入全螢幕時重新觸發"""
+        logger.warning(f"Failed to retrieve transcript for video {video_id}: {transcript_result.get('error')}")
+        self.processed_fullscreen_videos.discard(video_id)
     
     def _call_supadata_api(self, video_url: str) -> Dict[str, Any]:
         """調用 Supadata API 獲取轉錄"""
@@ -706,6 +728,7 @@ class YouTubeHandler:
                 return {
                     'success': False,
                     'error': f"API returned status {response.status_code}",
+                    'status_code': response.status_code,
                     'response_text': response.text
                 }
                 
@@ -748,12 +771,8 @@ class YouTubeHandler:
             # 儲存到檔案系統
             self._save_transcript_to_file(video_id, transcript_entry)
             
-            # 添加到字幕歷史
-            self.subtitle_history.append(transcript_entry)
-            
-            # 限制歷史記錄數量
-            if len(self.subtitle_history) > self.max_subtitle_history:
-                self.subtitle_history.pop(0)
+            # 添加到該影片的轉錄容器
+            self.subtitle_store.add_transcript(transcript_entry)
             
             logger.info(f"Stored transcript result for video: {video_id} (both in memory and file)")
             
@@ -784,18 +803,73 @@ class YouTubeHandler:
         if not video_id:
             return []
         
-        # 篩選出該視頻的轉錄數據
-        transcripts = [
-            entry for entry in self.subtitle_history
-            if entry.get('video_id') == video_id and entry.get('transcript_type') == 'supadata_api'
-        ]
-        
-        return transcripts
+        return self.subtitle_store.get_transcripts(video_id)
     
     def get_latest_transcript(self, video_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """獲取最新的轉錄數據"""
-        transcripts = self.get_video_transcripts(video_id)
-        return transcripts[-1] if transcripts else None
+        if video_id is None:
+            video_id = self.get_current_video_id()
+        
+        return self.subtitle_store.get_latest_transcript(video_id)
+    
+    def get_transcript_at(self, video_id: Optional[str] = None, time_ms: Optional[float] = None,
+                          window_ms: Optional[float] = None, start_ms: Optional[float] = None,
+                          end_ms: Optional[float] = None) -> Dict[str, Any]:
+        """查詢指定播放時間的轉錄片段（預設為當前視頻的當前播放時間）"""
+        current_video_id = self.get_current_video_id()
+        if video_id is None:
+            video_id = current_video_id
+        
+        if not video_id:
+            return {
+                "success": False,
+                "error": "No current video available",
+                "video_id": None
+            }
+        
+        # 未指定時間時使用當前播放時間（僅限當前視頻）
+        if time_ms is None and start_ms is None:
+            if video_id != current_video_id:
+                return {
+                    "success": False,
+                    "error": "Time is required for a video that is not playing",
+                    "video_id": video_id
+                }
+            time_ms = (self.current_data.get('currentTime') or 0) * 1000
+        
+        timeline = self.timeline_index.get(video_id, self.get_latest_transcript(video_id))
+        if timeline is None:
+            return {
+                "success": False,
+                "error": "No transcript available",
+                "video_id": video_id
+            }
+        
+        result = {
+            "success": True,
+            "video_id": video_id,
+            "time_ms": time_ms,
+            "total_segments": len(timeline)
+        }
+        
+        if start_ms is not None or window_ms:
+            if start_ms is None:
+                start_ms = time_ms - window_ms / 2
+                end_ms = time_ms + window_ms / 2
+            elif end_ms is None:
+                end_ms = start_ms + (window_ms or 0)
+            result.update({
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "segments": timeline.window(start_ms, end_ms)
+            })
+        
+        if time_ms is not None:
+            result["segment"] = timeline.segment_at(time_ms)
+            if result["segment"] is None:
+                result.update(timeline.neighbors(time_ms))
+        
+        return result
     
     def _ensure_subtitles_dir_exists(self):
         """確保字幕目錄存在"""
@@ -824,6 +898,9 @@ class YouTubeHandler:
             
             logger.info(f"Successfully saved transcript to file: {file_path}")
             
+            # 增量更新全文搜尋索引
+            self.search_index.add_transcript(video_id, transcript_entry)
+            
             # 自動觸發角色回應生成
             self._auto_generate_avatar_response(video_id)
             
@@ -839,26 +916,43 @@ class YouTubeHandler:
         try:
             logger.info(f"🤖 開始為影片 {video_id} 自動生成角色回應...")
             
-            # 在背景執行緒中執行，避免阻塞主線程
-            def generate_in_background():
-                try:
-                    success = generate_avatar_response_for_video(video_id, character_index=0)
-                    if success:
-                        logger.info(f"✅ 影片 {video_id} 的角色回應生成完成")
-                    else:
-                        logger.warning(f"❌ 影片 {video_id} 的角色回應生成失敗")
-                except Exception as e:
-                    logger.error(f"❌ 生成角色回應時發生錯誤 (影片 {video_id}): {e}")
+            # 交給生成工作佇列，避免阻塞主線程
+            job = self.generation_jobs.submit(video_id)
             
-            # 啟動背景執行緒
-            thread = threading.Thread(target=generate_in_background, daemon=True)
-            thread.start()
-            
-            logger.debug(f"Avatar response generation started in background for video {video_id}")
+            logger.debug(f"Avatar response generation queued for video {video_id}: job {job['job_id']}")
             
         except Exception as e:
             logger.error(f"Error starting avatar response generation for video {video_id}: {e}")
     
+    def _run_generation_job(self, video_id: str, should_cancel) -> bool:
+        """執行生成工作（在工作佇列執行緒中運行）"""
+        success = generate_avatar_response_for_video(
+            video_id,
+            character_index=0,
+            current_time_fn=lambda: self.get_playback_time_ms(video_id),
+            should_cancel=should_cancel
+        )
+        if success:
+            logger.info(f"✅ 影片 {video_id} 的角色回應生成完成")
+        else:
+            logger.warning(f"❌ 影片 {video_id} 的角色回應生成失敗或已取消")
+        return success
+    
+    def list_generation_jobs(self, video_id: Optional[str] = None) -> Dict[str, Any]:
+        """獲取生成工作列表與佇列統計"""
+        return {
+            "jobs": self.generation_jobs.list_jobs(video_id),
+            "statistics": self.generation_jobs.statistics()
+        }
+    
+    def get_generation_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """獲取生成工作狀態"""
+        return self.generation_jobs.get_job(job_id)
+    
+    def cancel_generation_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消生成工作"""
+        return self.generation_jobs.cancel(job_id)
+    
     def _load_transcript_from_file(self, video_id: str) -> Optional[Dict[str, Any]]:
         """從檔案載入轉錄結果"""
         try:
@@ -9,7 +9,6 @@ import json
 import logging
 import os
 import sys
-import threading
 import time
 from datetime import datetime
 from flask import Flask, request, jsonify, Response, send_file, abort
@@ -19,6 +18,9 @@ from flask_cors import CORS
 from handlers.chat import ChatHandler
 from handlers.youtube import YouTubeHandler
 from config.settings import Settings
+from services.async_runtime import AsyncRuntime
+from services.cue_index import AvatarCueIndex
+from services.playback_push import PlaybackCueBroadcaster
 
 # 設置 UTF-8 編碼（簡化版）
 import os
@@ -67,13 +69,25 @@ class UnifiedServer:
         # 初始化 YouTube 處理器 (不需要參數)
         self.youtube_handler = YouTubeHandler()
         
+        # 長駐事件迴圈：所有路由共用，避免每個請求都 asyncio.run 建立新迴圈
+        self.runtime = AsyncRuntime()
+        
         # 初始化聊天處理器 (需要 LLM 配置)
         llm_config = self.settings.get_llm_config()
-        self.chat_handler = ChatHandler(llm_config, tools_handler=None)
+        self.chat_handler = ChatHandler(llm_config, tools_handler=None, runtime=self.runtime)
         
         # 暫時設置一個空的 tools_handler 以避免錯誤
         self.tools_handler = None
         
+        # 初始化 avatar_talk 提示索引
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        avatar_talk_dir = os.path.join(os.path.dirname(backend_dir), "windows-app", "src", "data", "avatar_talk")
+        self.cue_index = AvatarCueIndex(avatar_talk_dir)
+        
+        # 播放提示推送：收到新的播放時間時才檢查並推送到期提示
+        self.playback_broadcaster = PlaybackCueBroadcaster(self.cue_index)
+        self.youtube_handler.subscribe_to_updates(self.playback_broadcaster.on_youtube_update)
+        
         self.logger.info("Handlers initialized successfully")
     
     def _setup_routes(self):
@@ -103,7 +117,7 @@ class UnifiedServer:
                     }), 400
                 
                 # 處理用戶消息
-                response = asyncio.run(self.chat_handler.process_message(user_message))
+                response = self.runtime.run(self.chat_handler.process_message(user_message))
                 
                 return jsonify({
                     "success": True,
@@ -192,7 +206,7 @@ class UnifiedServer:
                 data = request.get_json()
                 arguments = data.get('arguments', {})
                 
-                result = asyncio.run(self.tools_handler.call_tool(tool_name, arguments))
+                result = self.runtime.run(self.tools_handler.call_tool(tool_name, arguments))
                 
                 return jsonify({
                     "success": True,
@@ -283,6 +297,30 @@ class UnifiedServer:
                     "error": str(e)
                 }), 500
 
+        @self.app.route('/api/youtube/batch', methods=['POST'])
+        def receive_youtube_batch():
+            """批次接收 YouTube 數據（多幀、增量編碼）"""
+            try:
+                data = request.get_json()
+                frames = data.get('frames') if isinstance(data, dict) else None
+                
+                if not isinstance(frames, list) or not frames:
+                    return jsonify({
+                        "success": False,
+                        "error": "frames must be a non-empty list"
+                    }), 400
+                
+                result = self.youtube_handler.ingest_batch(frames)
+                
+                return jsonify(result)
+                
+            except Exception as e:
+                self.logger.error(f"YouTube batch data error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+
         @self.app.route('/api/youtube/video-id', methods=['GET'])
         def get_current_video_id():
             """獲取當前 YouTube 影片 ID"""
@@ -369,7 +407,8 @@ class UnifiedServer:
         def get_youtube_statistics():
             """獲取 YouTube 觀看統計"""
             try:
-                stats = self.youtube_handler.get_watching_statistics()
+                include_videos = request.args.get('videos', 'true').lower() != 'false'
+                stats = self.youtube_handler.get_watching_statistics(include_videos)
                 
                 return jsonify({
                     "success": True,
@@ -477,13 +516,16 @@ class UnifiedServer:
                         "error": "Query parameter 'q' is required"
                     }), 400
                 
-                # 自動使用當前視頻的字幕搜索
-                results = self.youtube_handler.search_subtitles(query, None)
+                # 未指定 video_id 時搜尋所有已儲存的轉錄
+                video_id = request.args.get('video_id') or None
+                limit = request.args.get('limit', 50, type=int)
+                results = self.youtube_handler.search_subtitles(query, video_id, limit)
                 current_video_id = self.youtube_handler.get_current_video_id()
                 
                 return jsonify({
                     "success": True,
                     "query": query,
+                    "video_id": video_id,
                     "current_video_id": current_video_id,
                     "results": results,
                     "count": len(results),
@@ -611,6 +653,36 @@ class UnifiedServer:
                     "error": str(e)
                 }), 500
         
+        @self.app.route('/api/youtube/transcript/at', methods=['GET'])
+        def get_transcript_at_time():
+            """獲取指定播放時間（秒）正在說的轉錄片段，或一段時間窗口內的片段"""
+            try:
+                video_id = request.args.get('video_id') or None
+                t = request.args.get('t', type=float)
+                window = request.args.get('window', type=float)
+                start = request.args.get('start', type=float)
+                end = request.args.get('end', type=float)
+                
+                result = self.youtube_handler.get_transcript_at(
+                    video_id,
+                    time_ms=t * 1000 if t is not None else None,
+                    window_ms=window * 1000 if window else None,
+                    start_ms=start * 1000 if start is not None else None,
+                    end_ms=end * 1000 if end is not None else None
+                )
+                
+                if result.get('success'):
+                    result["timestamp"] = datetime.now().isoformat()
+                    return jsonify(result)
+                return jsonify(result), 404
+                
+            except Exception as e:
+                self.logger.error(f"Get transcript at time error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+        
         @self.app.route('/api/youtube/transcript/trigger', methods=['POST'])
         def trigger_manual_transcript():
             """手動觸發轉錄處理"""
@@ -637,20 +709,15 @@ class UnifiedServer:
                             "error": "Could not extract video_id from URL"
                         }), 400
                 
-                # 在後台線程中處理轉錄
-                import threading
-                thread = threading.Thread(
-                    target=self.youtube_handler._process_video_transcript,
-                    args=(video_url, video_id),
-                    daemon=True
-                )
-                thread.start()
+                # 交給轉錄擷取工作池處理（同一影片進行中的工作會合併）
+                job = self.youtube_handler.request_transcript(video_id, video_url)
                 
                 return jsonify({
                     "success": True,
-                    "message": "Transcript processing started",
+                    "message": "Transcript already in progress" if job.get('coalesced') else "Transcript processing started",
                     "video_id": video_id,
                     "video_url": video_url,
+                    "job": job,
                     "timestamp": datetime.now().isoformat()
                 })
                 
@@ -661,6 +728,46 @@ class UnifiedServer:
                     "error": str(e)
                 }), 500
         
+        @self.app.route('/api/youtube/transcript/jobs', methods=['GET'])
+        def get_transcript_jobs():
+            """獲取轉錄擷取工作狀態"""
+            try:
+                result = self.youtube_handler.get_transcript_jobs()
+                result["success"] = True
+                result["timestamp"] = datetime.now().isoformat()
+                return jsonify(result)
+                
+            except Exception as e:
+                self.logger.error(f"Get transcript jobs error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+        
+        @self.app.route('/api/youtube/transcript/jobs/<video_id>', methods=['GET'])
+        def get_transcript_job(video_id):
+            """獲取指定影片的轉錄擷取工作狀態"""
+            try:
+                job = self.youtube_handler.get_transcript_job(video_id)
+                if job is None:
+                    return jsonify({
+                        "success": False,
+                        "error": f"No transcript job for video {video_id}"
+                    }), 404
+                
+                return jsonify({
+                    "success": True,
+                    "job": job,
+                    "timestamp": datetime.now().isoformat()
+                })
+                
+            except Exception as e:
+                self.logger.error(f"Get transcript job error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+        
         @self.app.route('/api/youtube/transcript/files', methods=['GET'])
         def list_transcript_files():
             """列出所有可用的轉錄檔案"""
@@ -715,12 +822,8 @@ class UnifiedServer:
             if request.method == 'GET':
                 # 返回當前標籤頁統計信息
                 try:
-                    tab_stats = {
-                        "active_tabs": len(self.youtube_handler.active_tabs),
-                        "youtube_tabs": len(self.youtube_handler.youtube_tabs),
-                        "tab_details": list(self.youtube_handler.active_tabs.values()),
-                        "timestamp": datetime.now().isoformat()
-                    }
+                    tab_stats = self.youtube_handler.get_tab_info()
+                    tab_stats["timestamp"] = datetime.now().isoformat()
                     
                     return jsonify({
                         "success": True,
@@ -762,6 +865,71 @@ class UnifiedServer:
                         "error": str(e)
                     }), 500
 
+        @self.app.route('/api/jobs', methods=['GET'])
+        def list_generation_jobs():
+            """獲取角色回應生成工作列表"""
+            try:
+                video_id = request.args.get('video_id')
+                result = self.youtube_handler.list_generation_jobs(video_id)
+                result["success"] = True
+                result["timestamp"] = datetime.now().isoformat()
+                return jsonify(result)
+                
+            except Exception as e:
+                self.logger.error(f"List generation jobs error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+        
+        @self.app.route('/api/jobs/<job_id>', methods=['GET'])
+        def get_generation_job(job_id):
+            """獲取角色回應生成工作狀態"""
+            try:
+                job = self.youtube_handler.get_generation_job(job_id)
+                if job is None:
+                    return jsonify({
+                        "success": False,
+                        "error": f"Job {job_id} not found"
+                    }), 404
+                
+                return jsonify({
+                    "success": True,
+                    "job": job,
+                    "timestamp": datetime.now().isoformat()
+                })
+                
+            except Exception as e:
+                self.logger.error(f"Get generation job error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+        
+        @self.app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+        def cancel_generation_job(job_id):
+            """取消角色回應生成工作（執行中的工作在下一個片段邊界停止）"""
+            try:
+                job = self.youtube_handler.cancel_generation_job(job_id)
+                if job is None:
+                    return jsonify({
+                        "success": False,
+                        "error": f"Job {job_id} not found"
+                    }), 404
+                
+                return jsonify({
+                    "success": True,
+                    "job": job,
+                    "timestamp": datetime.now().isoformat()
+                })
+                
+            except Exception as e:
+                self.logger.error(f"Cancel generation job error: {e}")
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 500
+
         @self.app.route('/api/voice_generation_complete', methods=['POST'])
         def handle_voice_generation_complete():
             """處理語音生成完成的回調"""
@@ -844,16 +1012,8 @@ class UnifiedServer:
                 
                 self.logger.info(f"[CHECK PLAYBACK] 當前播放: {video_title[:30]}... | 時間: {current_time}s ({current_time_ms}ms) | 播放中: {is_playing} | 影片ID: {video_id}")
                 
-                # 構建 avatar_talk JSON 檔案路徑
-                backend_dir = os.path.dirname(os.path.abspath(__file__))
-                parent_dir = os.path.dirname(backend_dir)
-                avatar_talk_dir = os.path.join(parent_dir, "windows-app", "src", "data", "avatar_talk")
-                avatar_file_path = os.path.join(avatar_talk_dir, f"{video_id}.json")
-                
-                self.logger.debug(f"[AVATAR TALK] 查找檔案: {avatar_file_path}")
-                
-                # 檢查 avatar_talk 檔案是否存在
-                if not os.path.exists(avatar_file_path):
+                # 從記憶體中的提示索引查找（檔案變更時才重新載入）
+                if not self.cue_index.has_cues(video_id):
                     self.logger.info(f"[NO AVATAR FILE] 沒有找到 avatar talk 檔案: {video_id}.json")
                     return jsonify({
                         "success": True,
@@ -861,41 +1021,8 @@ class UnifiedServer:
                         "content": None
                     })
                 
-                # 讀取 avatar_talk JSON 檔案
-                try:
-                    with open(avatar_file_path, 'r', encoding='utf-8') as f:
-                        avatar_data = json.load(f)
-                except (json.JSONDecodeError, IOError) as e:
-                    self.logger.error(f"[AVATAR FILE ERROR] 讀取檔案失敗: {e}")
-                    return jsonify({
-                        "success": False,
-                        "error": f"Failed to read avatar talk file: {str(e)}"
-                    }), 500
-                
-                # 尋找符合條件的語音內容
-                matching_entry = None
                 tolerance_ms = 2000  # 容許誤差範圍（毫秒）
-                
-                for entry in avatar_data:
-                    try:
-                        entry_time = entry.get("time", 0)  # avatar_talk 使用毫秒
-                        is_generated = entry.get("is_generated", False)
-                        reply = entry.get("Reply", "")
-                        file_path = entry.get("file_path", "")
-                        
-                        # 檢查時間是否匹配（都轉換為毫秒比較）
-                        time_matches = abs(entry_time - current_time_ms) <= tolerance_ms
-                        
-                        self.logger.debug(f"[CHECK ENTRY] 回應: {reply[:20]}... | 時間: {entry_time}ms | 當前: {current_time_ms}ms | 差異: {abs(entry_time - current_time_ms)}ms | 已生成: {is_generated} | 匹配: {time_matches}")
-                        
-                        if time_matches and is_generated and file_path:
-                            matching_entry = entry
-                            self.logger.info(f"[FOUND MATCH] 找到匹配內容: {reply} (時間: {entry_time}ms)")
-                            break
-                            
-                    except (ValueError, TypeError) as e:
-                        self.logger.warning(f"[ENTRY ERROR] 處理記錄時發生錯誤: {e}")
-                        continue
+                matching_entry = self.cue_index.find_cue(video_id, current_time_ms, tolerance_ms)
                 
                 # 回應結果
                 if matching_entry:
@@ -929,6 +1056,29 @@ class UnifiedServer:
                     "message": "檢查播放時發生錯誤"
                 }), 500
 
+        @self.app.route('/api/playback/stream', methods=['GET'])
+        def playback_stream():
+            """播放提示推送串流（SSE），取代每秒輪詢 /api/check-playback"""
+            return Response(
+                self.playback_broadcaster.stream(),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'Connection': 'keep-alive',
+                    'X-Accel-Buffering': 'no',
+                    'Access-Control-Allow-Origin': '*'
+                }
+            )
+        
+        @self.app.route('/api/playback/stream/statistics', methods=['GET'])
+        def get_playback_stream_statistics():
+            """獲取播放提示推送統計"""
+            return jsonify({
+                "success": True,
+                "data": self.playback_broadcaster.get_statistics(),
+                "timestamp": datetime.now().isoformat()
+            })
+
         @self.app.route('/api/audio/<filename>', methods=['GET'])
         def serve_audio_file(filename):
             """提供語音檔案的 HTTP 訪問"""
@@ -1001,6 +1151,14 @@ class UnifiedServer:
         if self.youtube_handler:
             self.youtube_handler.shutdown()
         
+        # 關閉 HTTP 連線池與事件迴圈
+        if self.runtime.is_running():
+            try:
+                self.runtime.run(self.chat_handler.aclose(), timeout=5)
+            except Exception as e:
+                self.logger.warning(f"Error closing chat handler: {e}")
+            self.runtime.shutdown()
+        
         self.logger.info("Server shutdown complete")
 
 
@@ -0,0 +1,18 @@
+"""
+服務模組 - 提供跨處理器共用的背景服務與資料索引
+"""
+
+from .async_runtime import AsyncRuntime
+from .cue_index import AvatarCueIndex
+from .generation_jobs import GenerationJobQueue
+from .playback_push import PlaybackCueBroadcaster
+from .subtitle_search import SubtitleSearchIndex
+from .subtitle_store import SubtitleStore
+from .tab_tracker import TabTracker
+from .transcript_fetcher import TranscriptFetcher
+from .transcript_timeline import TranscriptTimeline, TranscriptTimelineIndex
+from .watch_stats import WatchStatsAggregator
+
+__all__ = ['AsyncRuntime', 'AvatarCueIndex', 'GenerationJobQueue', 'PlaybackCueBroadcaster',
+           'SubtitleSearchIndex', 'SubtitleStore', 'TabTracker', 'TranscriptFetcher',
+           'TranscriptTimeline', 'TranscriptTimelineIndex', 'WatchStatsAggregator']
\ No newline at end of file
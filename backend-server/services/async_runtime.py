@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+常駐非同步執行環境
+每個服務器進程只建立一個長駐事件迴圈，Flask 路由將協程提交至此迴圈執行
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class AsyncRuntime:
+    """在背景執行緒中運行的長駐事件迴圈"""
+
+    def __init__(self, name: str = "async-runtime"):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name=name, daemon=True)
+        self._thread.start()
+        logger.info("Async runtime started")
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """獲取事件迴圈"""
+        return self._loop
+
+    def is_running(self) -> bool:
+        """檢查事件迴圈是否運行中"""
+        return self._thread.is_alive() and not self._loop.is_closed()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """提交協程，返回可跨執行緒等待的 Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """提交協程並阻塞等待結果（供同步的 Flask 路由使用）"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """將非同步產生器轉為同步迭代器（供串流回應使用）"""
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((True, item))
+            except BaseException as e:
+                items.put((False, e))
+                raise
+            finally:
+                items.put((True, _DONE))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                ok, item = items.get()
+                if item is _DONE:
+                    break
+                if not ok:
+                    raise item
+                yield item
+        finally:
+            # 客戶端中斷時取消上游請求
+            if not future.done():
+                future.cancel()
+
+    def shutdown(self, timeout: float = 5.0):
+        """停止事件迴圈"""
+        if self._loop.is_closed():
+            return
+
+        async def cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self.run(cancel_pending(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Error cancelling pending tasks: {e}")
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+        logger.info("Async runtime stopped")
+
+    def _run_loop(self):
+        """事件迴圈執行緒"""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
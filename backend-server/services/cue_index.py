@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+角色語音提示索引
+將 avatar_talk/<video_id>.json 依時間排序後常駐記憶體，以二分搜尋查詢播放提示
+"""
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _VideoCues:
+    """單一影片的已排序提示資料"""
+
+    __slots__ = ('signature', 'times', 'entries')
+
+    def __init__(self, signature: Tuple[int, int], timed_entries: List[Tuple[float, Dict[str, Any]]]):
+        self.signature = signature
+        self.times = [entry_time for entry_time, _ in timed_entries]
+        self.entries = [entry for _, entry in timed_entries]
+
+
+class AvatarCueIndex:
+    """avatar_talk 提示索引（依檔案 mtime 自動重新載入）"""
+
+    def __init__(self, avatar_talk_dir: str):
+        self.avatar_talk_dir = avatar_talk_dir
+        self._videos: Dict[str, _VideoCues] = {}
+        self._lock = threading.Lock()
+
+    def get_file_path(self, video_id: str) -> str:
+        """獲取 avatar_talk 檔案路徑"""
+        return os.path.join(self.avatar_talk_dir, f"{video_id}.json")
+
+    def has_cues(self, video_id: str) -> bool:
+        """檢查影片是否有 avatar_talk 檔案"""
+        return self._get_video(video_id) is not None
+
+    def find_cue(self, video_id: str, time_ms: float, tolerance_ms: float = 2000) -> Optional[Dict[str, Any]]:
+        """尋找時間容許範圍內、已生成語音的第一個提示"""
+        cues = self._get_video(video_id)
+        if cues is None:
+            return None
+
+        start = bisect_left(cues.times, time_ms - tolerance_ms)
+        end = bisect_right(cues.times, time_ms + tolerance_ms)
+
+        for entry in cues.entries[start:end]:
+            if entry.get("is_generated", False) and entry.get("file_path"):
+                return entry
+
+        return None
+
+    def get_cues(self, video_id: str) -> List[Dict[str, Any]]:
+        """獲取影片的所有提示（依時間排序）"""
+        cues = self._get_video(video_id)
+        return list(cues.entries) if cues else []
+
+    def invalidate(self, video_id: Optional[str] = None):
+        """清除快取"""
+        with self._lock:
+            if video_id:
+                self._videos.pop(video_id, None)
+            else:
+                self._videos.clear()
+
+    def _get_video(self, video_id: str) -> Optional[_VideoCues]:
+        """獲取影片提示，檔案變更時重新載入"""
+        if not video_id:
+            return None
+
+        file_path = self.get_file_path(video_id)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            with self._lock:
+                self._videos.pop(video_id, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cues = self._videos.get(video_id)
+        if cues is not None and cues.signature == signature:
+            return cues
+
+        with self._lock:
+            cues = self._videos.get(video_id)
+            if cues is not None and cues.signature == signature:
+                return cues
+
+            entries = self._load_entries(file_path)
+            if entries is None:
+                # 檔案暫時無法解析（例如寫入中），沿用舊的索引
+                return cues
+
+            cues = _VideoCues(signature, entries)
+            self._videos[video_id] = cues
+            logger.debug(f"Loaded {len(entries)} avatar cues for video {video_id}")
+            return cues
+
+    def _load_entries(self, file_path: str) -> Optional[List[Tuple[float, Dict[str, Any]]]]:
+        """讀取並排序 avatar_talk 檔案內容"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                avatar_data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Failed to read avatar talk file {file_path}: {e}")
+            return None
+
+        timed_entries = []
+        for entry in avatar_data if isinstance(avatar_data, list) else []:
+            try:
+                entry_time = float(entry.get("time", 0))  # avatar_talk 使用毫秒
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Skipping invalid avatar talk entry: {e}")
+                continue
+            timed_entries.append((entry_time, entry))
+
+        timed_entries.sort(key=lambda item: item[0])
+        return timed_entries
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+角色回應生成工作佇列
+固定數量的工作執行緒依優先級處理生成工作，正在播放的影片優先；同一影片只會有一個進行中的工作，
+取消的工作會在下一個片段邊界停止
+"""
+
+import itertools
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# 尚未結束的工作狀態
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+
+
+class GenerationJobQueue:
+    """角色回應生成工作佇列"""
+
+    def __init__(self, run_fn: Callable[[str, Callable[[], bool]], bool],
+                 current_video_fn: Optional[Callable[[], Optional[str]]] = None,
+                 workers: int = 2, max_finished_jobs: int = 200):
+        self.run_fn = run_fn  # run_fn(video_id, should_cancel) -> 是否成功
+        self.current_video_fn = current_video_fn
+        self.max_finished_jobs = max_finished_jobs
+
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # {job_id: job}（依提交順序）
+        self._active_by_video: Dict[str, str] = {}  # {video_id: job_id}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+
+        self._running = True
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"generation-job-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, video_id: str, priority: int = 0, source: str = 'auto') -> Dict[str, Any]:
+        """提交生成工作；同一影片已有進行中的工作時直接返回該工作"""
+        with self._cond:
+            job_id = self._active_by_video.get(video_id)
+            if job_id is not None and self._jobs[job_id]['status'] != 'cancelling':
+                self.deduplicated += 1
+                job = self._jobs[job_id]
+                job['priority'] = max(job['priority'], priority)
+                return dict(self._format_job(job), deduplicated=True)
+
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                'job_id': job_id,
+                'video_id': video_id,
+                'status': 'queued',
+                'priority': priority,
+                'source': source,
+                'error': None,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._jobs[job_id] = job
+            self._active_by_video[video_id] = job_id
+            self._cancel_events[job_id] = threading.Event()
+            job['_order'] = next(self._order)
+            self.submitted += 1
+            self._trim_finished()
+            self._cond.notify()
+            return dict(self._format_job(job), deduplicated=False)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消工作；排隊中的工作立即取消，執行中的工作在下一個片段邊界停止"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+
+            if job['status'] == 'queued':
+                self._finish(job, 'cancelled')
+            elif job['status'] == 'running':
+                job['status'] = 'cancelling'
+                self._cancel_events[job_id].set()
+            return self._format_job(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """獲取工作狀態"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return self._format_job(job) if job else None
+
+    def list_jobs(self, video_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出工作（最新的在前）"""
+        with self._cond:
+            return [
+                self._format_job(job) for job in reversed(self._jobs.values())
+                if video_id is None or job['video_id'] == video_id
+            ]
+
+    def statistics(self) -> Dict[str, Any]:
+        """獲取佇列統計"""
+        with self._cond:
+            statuses = {status: 0 for status in ACTIVE_STATUSES}
+            for job in self._jobs.values():
+                if job['status'] in statuses:
+                    statuses[job['status']] += 1
+            return dict(
+                statuses,
+                workers=len(self._workers),
+                submitted=self.submitted,
+                deduplicated=self.deduplicated,
+                succeeded=self.succeeded,
+                failed=self.failed,
+                cancelled=self.cancelled
+            )
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止工作執行緒並要求執行中的工作停止"""
+        with self._cond:
+            self._running = False
+            for job in self._jobs.values():
+                if job['status'] == 'running':
+                    self._cancel_events[job['job_id']].set()
+            self._cond.notify_all()
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join(timeout=timeout)
+
+    # ===== 內部工具 =====
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """選出下一個工作：正在播放的影片優先，其次依優先級與提交順序（呼叫端需持有鎖）"""
+        # 同一影片仍有工作在停止中時先不開始新的工作，避免同時寫入同一個輸出檔
+        busy_videos = {job['video_id'] for job in self._jobs.values() if job['status'] in ('running', 'cancelling')}
+        queued = [
+            job for job in self._jobs.values()
+            if job['status'] == 'queued' and job['video_id'] not in busy_videos
+        ]
+        if not queued:
+            return None
+
+        current_video = None
+        if self.current_video_fn:
+            try:
+                current_video = self.current_video_fn()
+            except Exception as e:
+                logger.debug(f"Failed to get current video for job priority: {e}")
+
+        return min(queued, key=lambda job: (job['video_id'] != current_video, -job['priority'], job['_order']))
+
+    def _worker_loop(self):
+        """工作執行緒主迴圈"""
+        while True:
+            with self._cond:
+                job = None
+                while self._running:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+
+                job['status'] = 'running'
+                job['started_at'] = datetime.now().isoformat()
+                job_id, video_id = job['job_id'], job['video_id']
+                cancel_event = self._cancel_events[job_id]
+
+            logger.info(f"Generation job {job_id} started for video {video_id}")
+            error = None
+            try:
+                success = self.run_fn(video_id, cancel_event.is_set)
+            except Exception as e:
+                success = False
+                error = str(e)
+
+            with self._cond:
+                # 取消要求在最後一個片段完成後才到達時，工作已經完整結束，仍視為成功
+                if success:
+                    self._finish(job, 'succeeded')
+                elif cancel_event.is_set():
+                    self._finish(job, 'cancelled')
+                else:
+                    self._finish(job, 'failed', error or 'Generation failed')
+                # 喚醒等待同一影片的工作
+                self._cond.notify_all()
+            logger.info(f"Generation job {job_id} for video {video_id} finished: {job['status']}")
+
+    def _finish(self, job: Dict[str, Any], status: str, error: Optional[str] = None):
+        """結束工作（呼叫端需持有鎖）"""
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = datetime.now().isoformat()
+        if status == 'succeeded':
+            self.succeeded += 1
+        elif status == 'cancelled':
+            self.cancelled += 1
+        else:
+            self.failed += 1
+
+        if self._active_by_video.get(job['video_id']) == job['job_id']:
+            del self._active_by_video[job['video_id']]
+        self._cancel_events.pop(job['job_id'], None)
+
+    def _trim_finished(self):
+        """保留最近的已結束工作（呼叫端需持有鎖）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _format_job(job: Dict[str, Any]) -> Dict[str, Any]:
+        """格式化工作資料"""
+        return {key: value for key, value in job.items() if not key.startswith('_')}
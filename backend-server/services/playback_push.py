@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+播放提示推送服務
+在收到 YouTube 播放時間時，只於 avatar_talk 提示到期的瞬間推送事件給桌面客戶端（SSE）
+"""
+
+import json
+import logging
+import queue
+import threading
+from typing import Dict, Any, Iterator, Tuple
+
+from .cue_index import AvatarCueIndex
+
+logger = logging.getLogger(__name__)
+
+
+class PlaybackCueBroadcaster:
+    """播放提示廣播器"""
+
+    def __init__(self, cue_index: AvatarCueIndex, tolerance_ms: float = 2000,
+                 keepalive_interval: float = 15.0, max_queue_size: int = 32):
+        self.cue_index = cue_index
+        self.tolerance_ms = tolerance_ms
+        self.keepalive_interval = keepalive_interval
+        self.max_queue_size = max_queue_size
+
+        self._clients = set()
+        self._lock = threading.Lock()
+        # 每個分頁/影片各自記錄最後推送的提示，多個分頁同時播放時不會互相覆蓋
+        self._last_cue_keys: Dict[Tuple[Any, str], Tuple[str, Any, str]] = {}  # {(tabId, video_id): 提示鍵}
+        self._last_events: Dict[Tuple[Any, str], Dict[str, Any]] = {}  # {(tabId, video_id): 事件}
+        self.events_pushed = 0
+
+    def on_youtube_update(self, data: Dict[str, Any]):
+        """YouTubeHandler 訂閱回調：檢查是否有提示到期"""
+        try:
+            if data.get('type') == 'transcript_update' or 'currentTime' not in data:
+                return
+
+            video_id = data.get('videoId')
+            if not video_id:
+                return
+
+            current_time_ms = (data.get('currentTime') or 0) * 1000
+            cue = self.cue_index.find_cue(video_id, current_time_ms, self.tolerance_ms)
+            source = (data.get('tabId'), video_id)
+
+            with self._lock:
+                # 分頁切換影片後，舊影片的紀錄不再需要
+                for stale in [key for key in self._last_cue_keys if key[0] == source[0] and key != source]:
+                    self._last_cue_keys.pop(stale, None)
+                    self._last_events.pop(stale, None)
+
+                if cue is None:
+                    self._last_cue_keys.pop(source, None)
+                    self._last_events.pop(source, None)
+                    return
+
+                cue_key = (video_id, cue.get('time'), cue.get('file_path'))
+                if cue_key == self._last_cue_keys.get(source):
+                    return
+
+                self._last_cue_keys[source] = cue_key
+                event = self._last_events[source] = self._build_event(video_id, cue)
+                clients = list(self._clients)
+
+            for client_queue in clients:
+                self._offer(client_queue, event)
+            self.events_pushed += 1
+
+            logger.info(f"[CUE PUSH] 推送播放提示: {cue.get('Reply', '')} | 影片: {video_id} | 客戶端: {len(clients)}")
+
+        except Exception as e:
+            logger.error(f"Playback cue broadcast error: {e}")
+
+    def subscribe(self) -> queue.Queue:
+        """註冊新的串流客戶端"""
+        client_queue = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._clients.add(client_queue)
+            # 新客戶端立即收到目前仍在容許範圍內的提示
+            for event in list(self._last_events.values())[-self.max_queue_size:]:
+                client_queue.put_nowait(event)
+        logger.info(f"Playback stream client connected ({len(self._clients)} total)")
+        return client_queue
+
+    def unsubscribe(self, client_queue: queue.Queue):
+        """移除串流客戶端"""
+        with self._lock:
+            self._clients.discard(client_queue)
+        logger.info(f"Playback stream client disconnected ({len(self._clients)} total)")
+
+    def stream(self) -> Iterator[str]:
+        """產生 SSE 串流內容；在產生器內註冊，確保客戶端在第一段內容前斷線時也會移除"""
+        client_queue = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = client_queue.get(timeout=self.keepalive_interval)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(client_queue)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """獲取推送統計"""
+        return {
+            "clients": len(self._clients),
+            "events_pushed": self.events_pushed
+        }
+
+    def _offer(self, client_queue: queue.Queue, event: Dict[str, Any]):
+        """放入事件，客戶端過慢時丟棄最舊的事件"""
+        while True:
+            try:
+                client_queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    client_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    @staticmethod
+    def _build_event(video_id: str, cue: Dict[str, Any]) -> Dict[str, Any]:
+        """構建與 /api/check-playback 相同格式的事件"""
+        return {
+            "success": True,
+            "should_play": True,
+            "video_id": video_id,
+            "time": cue.get("time"),
+            "content": {
+                "message": cue.get("Reply"),
+                "is_generated": cue.get("is_generated"),
+                "file_path": cue.get("file_path")
+            }
+        }
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+字幕全文搜尋索引
+對所有已儲存的轉錄片段建立倒排索引，中日韓文字以字元 n-gram 切詞，英數以單字切詞
+"""
+
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# 英數單字與其他（中日韓等）非空白字元分開切詞
+_WORD_RE = re.compile(r"[0-9a-z]+(?:['_][0-9a-z]+)*")
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+
+
+def normalize_text(text: str) -> str:
+    """正規化文字（全形轉半形、小寫）"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text: str, ngram: int = 2, include_unigrams: bool = True) -> List[str]:
+    """切詞：中日韓文字產生字元 n-gram（可含單字），英數產生單字"""
+    normalized = normalize_text(text)
+    tokens = _WORD_RE.findall(normalized)
+
+    for run in _CJK_RUN_RE.findall(normalized):
+        if include_unigrams or len(run) < ngram:
+            tokens.extend(run)
+        tokens.extend(run[i:i + ngram] for i in range(len(run) - ngram + 1))
+
+    return tokens
+
+
+class SubtitleSearchIndex:
+    """轉錄片段倒排索引"""
+
+    def __init__(self, subtitles_dir: Optional[str] = None, ngram: int = 2):
+        self.subtitles_dir = subtitles_dir
+        self.ngram = ngram
+
+        self._postings: Dict[str, Dict[int, int]] = {}  # token -> {segment_id: 詞頻}
+        self._segments: Dict[int, Dict[str, Any]] = {}
+        self._video_segments: Dict[str, List[int]] = {}
+        self._next_segment_id = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self):
+        """首次使用時從字幕目錄建立索引"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self.subtitles_dir and os.path.isdir(self.subtitles_dir):
+                self.load_directory(self.subtitles_dir)
+
+    def load_directory(self, subtitles_dir: str) -> int:
+        """載入目錄中所有轉錄檔案"""
+        count = 0
+        for file_path in sorted(glob.glob(os.path.join(subtitles_dir, "*.json"))):
+            video_id = os.path.splitext(os.path.basename(file_path))[0]
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    transcript_entry = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Skipping unreadable transcript file {file_path}: {e}")
+                continue
+            count += self.add_transcript(video_id, transcript_entry)
+
+        logger.info(f"Subtitle search index built: {len(self._video_segments)} videos, {count} segments")
+        return count
+
+    def add_transcript(self, video_id: str, transcript_entry: Dict[str, Any]) -> int:
+        """加入（或取代）影片的轉錄片段，返回索引的片段數"""
+        transcript_data = transcript_entry.get('transcript_data') or {}
+        content = transcript_data.get('content') or []
+        video_title = transcript_entry.get('video_title')
+
+        with self._lock:
+            self._remove_video(video_id)
+
+            segment_ids = []
+            for item in content:
+                text = item.get('text') if isinstance(item, dict) else None
+                if not text:
+                    continue
+
+                segment_id = self._next_segment_id
+                self._next_segment_id += 1
+                self._segments[segment_id] = {
+                    'video_id': video_id,
+                    'video_title': video_title,
+                    'offset': item.get('offset', 0),
+                    'duration': item.get('duration', 0),
+                    'text': text,
+                    'normalized': normalize_text(text)
+                }
+                for token, tf in Counter(tokenize(text, self.ngram)).items():
+                    self._postings.setdefault(token, {})[segment_id] = tf
+                segment_ids.append(segment_id)
+
+            self._video_segments[video_id] = segment_ids
+            return len(segment_ids)
+
+    def remove_video(self, video_id: str):
+        """移除影片的所有片段"""
+        with self._lock:
+            self._remove_video(video_id)
+
+    def search(self, query: str, video_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """搜尋片段，返回依分數排序的結果"""
+        self.ensure_loaded()
+
+        normalized_query = normalize_text(query).strip()
+        query_tokens = set(tokenize(query, self.ngram, include_unigrams=False))
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            postings = []
+            for token in query_tokens:
+                token_postings = self._postings.get(token)
+                if not token_postings:
+                    return []
+                postings.append((token, token_postings))
+
+            # 從最短的倒排列表開始取交集
+            postings.sort(key=lambda item: len(item[1]))
+            candidates = set(postings[0][1])
+            for _, token_postings in postings[1:]:
+                candidates.intersection_update(token_postings)
+                if not candidates:
+                    return []
+
+            if video_id:
+                candidates = {sid for sid in candidates if self._segments[sid]['video_id'] == video_id}
+
+            total_segments = max(len(self._segments), 1)
+            scored = []
+            for segment_id in candidates:
+                segment = self._segments[segment_id]
+                score = 0.0
+                for _, token_postings in postings:
+                    idf = math.log(total_segments / len(token_postings)) + 1.0
+                    score += token_postings[segment_id] * idf
+                # 完整包含查詢字串時加權
+                if normalized_query and normalized_query in segment['normalized']:
+                    score *= 2.0
+                # 較短的片段更貼近查詢
+                score /= 1.0 + math.log(1 + len(segment['normalized']))
+                scored.append((score, segment))
+
+        scored.sort(key=lambda item: (-item[0], item[1]['video_id'], item[1]['offset']))
+        return [self._format_hit(segment, score) for score, segment in scored[:limit]]
+
+    def statistics(self) -> Dict[str, Any]:
+        """獲取索引統計"""
+        with self._lock:
+            return {
+                "videos": len(self._video_segments),
+                "segments": len(self._segments),
+                "tokens": len(self._postings),
+                "loaded": self._loaded
+            }
+
+    def _remove_video(self, video_id: str):
+        """移除影片片段（呼叫端需持有鎖）"""
+        for segment_id in self._video_segments.pop(video_id, []):
+            segment = self._segments.pop(segment_id, None)
+            if segment is None:
+                continue
+            for token in set(tokenize(segment['text'], self.ngram)):
+                token_postings = self._postings.get(token)
+                if token_postings is None:
+                    continue
+                token_postings.pop(segment_id, None)
+                if not token_postings:
+                    del self._postings[token]
+
+    @staticmethod
+    def _format_hit(segment: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """格式化搜尋結果"""
+        return {
+            'video_id': segment['video_id'],
+            'video_title': segment['video_title'],
+            'offset': segment['offset'],
+            'duration': segment['duration'],
+            'video_time': segment['offset'] / 1000 if segment['offset'] else 0,
+            'text': segment['text'],
+            'score': round(score, 4),
+            'source': 'transcript'
+        }
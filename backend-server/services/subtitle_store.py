@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+字幕儲存層
+以 video_id 為鍵，將即時字幕條目與 API 轉錄結果分開存放於有上限的容器中
+"""
+
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class SubtitleStore:
+    """依影片分組的字幕與轉錄儲存"""
+
+    def __init__(self, max_captions_per_video: int = 200, max_transcripts_per_video: int = 3,
+                 max_videos: int = 50):
+        self.max_captions_per_video = max_captions_per_video
+        self.max_transcripts_per_video = max_transcripts_per_video
+        self.max_videos = max_videos
+
+        # 依最近使用順序排列的影片 {video_id: deque}
+        self._captions: "OrderedDict[Optional[str], deque]" = OrderedDict()
+        self._transcripts: "OrderedDict[Optional[str], deque]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        # 增量統計
+        self._caption_count = 0
+        self._transcript_count = 0
+        self._total_characters = 0
+        self._languages = Counter()
+
+    # ===== 即時字幕 =====
+
+    def add_caption(self, entry: Dict[str, Any]) -> bool:
+        """新增即時字幕條目（與該影片上一條重複時略過）"""
+        video_id = entry.get('video_id')
+        with self._lock:
+            captions = self._touch(self._captions, video_id)
+
+            if captions and self._is_duplicate(captions[-1], entry):
+                return False
+
+            if len(captions) >= self.max_captions_per_video:
+                self._forget_caption(captions.popleft())
+
+            captions.append(entry)
+            self._caption_count += 1
+            self._total_characters += len(entry.get('text') or '')
+            language = self._get_language(entry)
+            if language:
+                self._languages[language] += 1
+
+            self._evict_videos(self._captions, self._forget_caption)
+            return True
+
+    def get_captions(self, video_id: Optional[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """獲取指定影片的字幕條目（最近的 limit 條）"""
+        with self._lock:
+            captions = self._captions.get(video_id)
+            if not captions:
+                return []
+            if limit is None or limit >= len(captions):
+                return list(captions)
+            if limit <= 0:
+                return []
+            return list(captions)[-limit:]
+
+    def get_all_captions(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """獲取所有影片的字幕條目（依影片最近使用順序）"""
+        with self._lock:
+            entries = [entry for captions in self._captions.values() for entry in captions]
+        return entries[-limit:] if limit else entries
+
+    def count_captions(self, video_id: Optional[str]) -> int:
+        """獲取指定影片的字幕條目數量"""
+        with self._lock:
+            captions = self._captions.get(video_id)
+            return len(captions) if captions else 0
+
+    # ===== API 轉錄 =====
+
+    def add_transcript(self, entry: Dict[str, Any]):
+        """新增 API 轉錄結果"""
+        video_id = entry.get('video_id')
+        with self._lock:
+            transcripts = self._touch(self._transcripts, video_id)
+            if len(transcripts) >= self.max_transcripts_per_video:
+                transcripts.popleft()
+                self._transcript_count -= 1
+            transcripts.append(entry)
+            self._transcript_count += 1
+            self._evict_videos(self._transcripts, self._forget_transcript)
+
+    def get_transcripts(self, video_id: Optional[str]) -> List[Dict[str, Any]]:
+        """獲取指定影片的轉錄結果"""
+        with self._lock:
+            transcripts = self._transcripts.get(video_id)
+            return list(transcripts) if transcripts else []
+
+    def get_latest_transcript(self, video_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """獲取指定影片最新的轉錄結果"""
+        with self._lock:
+            transcripts = self._transcripts.get(video_id)
+            return transcripts[-1] if transcripts else None
+
+    # ===== 清除與統計 =====
+
+    def clear(self, video_id: Optional[str] = None):
+        """清除指定影片或全部的字幕資料"""
+        with self._lock:
+            if video_id is None:
+                self._captions.clear()
+                self._transcripts.clear()
+                self._caption_count = 0
+                self._transcript_count = 0
+                self._total_characters = 0
+                self._languages.clear()
+                return
+
+            for entry in self._captions.pop(video_id, ()):
+                self._forget_caption(entry)
+            for entry in self._transcripts.pop(video_id, ()):
+                self._forget_transcript(entry)
+
+    def statistics(self) -> Dict[str, Any]:
+        """獲取字幕統計（常數時間）"""
+        with self._lock:
+            unique_videos = set(self._captions) | set(self._transcripts)
+            unique_videos.discard(None)
+            return {
+                "total_entries": self._caption_count + self._transcript_count,
+                "caption_entries": self._caption_count,
+                "transcript_entries": self._transcript_count,
+                "unique_videos": len(unique_videos),
+                "languages": [language for language, count in self._languages.items() if count > 0],
+                "total_characters": self._total_characters
+            }
+
+    # ===== 內部工具 =====
+
+    def _touch(self, containers: "OrderedDict", video_id: Optional[str]) -> deque:
+        """獲取影片容器並標記為最近使用"""
+        container = containers.get(video_id)
+        if container is None:
+            container = deque()
+            containers[video_id] = container
+        else:
+            containers.move_to_end(video_id)
+        return container
+
+    def _evict_videos(self, containers: "OrderedDict", forget):
+        """超過影片數量上限時移除最久未使用的影片"""
+        while len(containers) > self.max_videos:
+            video_id, entries = containers.popitem(last=False)
+            for entry in entries:
+                forget(entry)
+            logger.debug(f"Evicted subtitle data for video: {video_id}")
+
+    def _forget_caption(self, entry: Dict[str, Any]):
+        """從統計中扣除字幕條目"""
+        self._caption_count -= 1
+        self._total_characters -= len(entry.get('text') or '')
+        language = self._get_language(entry)
+        if language:
+            self._languages[language] -= 1
+            if self._languages[language] <= 0:
+                del self._languages[language]
+
+    def _forget_transcript(self, entry: Dict[str, Any]):
+        """從統計中扣除轉錄結果"""
+        self._transcript_count -= 1
+
+    @staticmethod
+    def _get_language(entry: Dict[str, Any]) -> Optional[str]:
+        """獲取字幕條目的語言"""
+        track = entry.get('track')
+        return track.get('language') if isinstance(track, dict) else None
+
+    @staticmethod
+    def _is_duplicate(last_entry: Dict[str, Any], new_entry: Dict[str, Any]) -> bool:
+        """同一影片、相同文本且時間相近則視為重複"""
+        return (
+            last_entry.get('text') == new_entry.get('text') and
+            abs((last_entry.get('video_time') or 0) - (new_entry.get('video_time') or 0)) < 2
+        )
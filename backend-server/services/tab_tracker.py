@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+標籤頁存活追蹤
+以到期時間堆積（expiry heap）管理標籤頁存活，只在截止時間到達時才喚醒清理，閒置時不耗 CPU
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class TabTracker:
+    """活動標籤頁追蹤器"""
+
+    def __init__(self, ttl_seconds: float = 5.0, on_expire: Optional[Callable[[Any], None]] = None):
+        self.ttl_seconds = ttl_seconds
+        self.on_expire = on_expire
+
+        self.active_tabs: Dict[Any, Dict[str, Any]] = {}  # {tab_id: tab_info}
+        self.youtube_tabs = set()
+
+        self._deadlines: Dict[Any, float] = {}  # 每個標籤頁真正的截止時間（monotonic）
+        self._heap: List = []  # (deadline, seq, tab_id)，每個標籤頁最多一筆
+        self._in_heap = set()
+        self._seq = 0
+        self._cond = threading.Condition()
+
+        self.touches = 0
+        self.expirations = 0
+        self.wakeups = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._expiry_loop, name="tab-expiry", daemon=True)
+        self._thread.start()
+
+    def touch(self, tab_id: Any, tab_info: Dict[str, Any]):
+        """更新標籤頁資訊並延長其截止時間"""
+        with self._cond:
+            self.touches += 1
+            self.active_tabs[tab_id] = tab_info
+            if tab_info.get('is_youtube'):
+                self.youtube_tabs.add(tab_id)
+
+            deadline = time.monotonic() + self.ttl_seconds
+            self._deadlines[tab_id] = deadline
+
+            # 已在堆積中的標籤頁只更新截止時間，到期檢查時再重新排入
+            if tab_id not in self._in_heap:
+                self._push(deadline, tab_id)
+                if self._heap[0][2] == tab_id:
+                    self._cond.notify()
+
+    def remove(self, tab_id: Any) -> bool:
+        """移除標籤頁"""
+        with self._cond:
+            return self._forget(tab_id)
+
+    def get_tab(self, tab_id: Any) -> Optional[Dict[str, Any]]:
+        """獲取標籤頁資訊"""
+        with self._cond:
+            return self.active_tabs.get(tab_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """獲取標籤頁快照"""
+        with self._cond:
+            return {
+                "active_tabs": len(self.active_tabs),
+                "youtube_tabs": len(self.youtube_tabs),
+                "tab_details": list(self.active_tabs.values())
+            }
+
+    def statistics(self) -> Dict[str, Any]:
+        """獲取追蹤器統計"""
+        with self._cond:
+            next_deadline = self._heap[0][0] - time.monotonic() if self._heap else None
+            return {
+                "active_tabs": len(self.active_tabs),
+                "youtube_tabs": len(self.youtube_tabs),
+                "ttl_seconds": self.ttl_seconds,
+                "pending_deadlines": len(self._heap),
+                "next_expiry_in": round(max(next_deadline, 0), 3) if next_deadline is not None else None,
+                "touches": self.touches,
+                "expirations": self.expirations,
+                "wakeups": self.wakeups
+            }
+
+    def stop(self, timeout: float = 2.0):
+        """停止到期檢查執行緒"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def _push(self, deadline: float, tab_id: Any):
+        """加入堆積（呼叫端需持有鎖）"""
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, tab_id))
+        self._in_heap.add(tab_id)
+
+    def _forget(self, tab_id: Any) -> bool:
+        """移除標籤頁狀態（呼叫端需持有鎖；堆積中的舊項目會在到期時略過）"""
+        existed = self.active_tabs.pop(tab_id, None) is not None
+        self.youtube_tabs.discard(tab_id)
+        self._deadlines.pop(tab_id, None)
+        return existed
+
+    def _expiry_loop(self):
+        """到期檢查執行緒：沒有標籤頁時無限期等待，否則只等到最早的截止時間"""
+        while True:
+            expired = []
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+
+                    deadline, _, tab_id = self._heap[0]
+                    now = time.monotonic()
+                    if deadline > now:
+                        self._cond.wait(deadline - now)
+                        self.wakeups += 1
+                        continue
+
+                    heapq.heappop(self._heap)
+                    self._in_heap.discard(tab_id)
+
+                    actual_deadline = self._deadlines.get(tab_id)
+                    if actual_deadline is None:
+                        continue  # 已被移除
+                    if actual_deadline > now:
+                        self._push(actual_deadline, tab_id)  # 期間內有更新，重新排入
+                        continue
+
+                    self._forget(tab_id)
+                    self.expirations += 1
+                    expired.append(tab_id)
+                    # 批次處理同時到期的標籤頁
+                    if not self._heap or self._heap[0][0] > now:
+                        break
+
+                if not self._running:
+                    return
+
+            for tab_id in expired:
+                logger.debug(f"Tab {tab_id} expired after {self.ttl_seconds}s without updates")
+                if self.on_expire:
+                    try:
+                        self.on_expire(tab_id)
+                    except Exception as e:
+                        logger.error(f"Tab expiry callback error: {e}")
+
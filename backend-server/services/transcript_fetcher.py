@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+轉錄擷取服務
+固定數量的工作執行緒從優先佇列取出工作；同一影片同時只有一個工作（single-flight），失敗時以指數退避重試
+"""
+
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0  # 手動觸發
+PRIORITY_NORMAL = 1  # 全螢幕/影劇模式自動觸發
+
+# 尚未結束的工作狀態
+ACTIVE_STATUSES = ('queued', 'running', 'retry_wait', 'finishing')
+
+
+class TranscriptFetcher:
+    """有上限的轉錄擷取工作池"""
+
+    def __init__(self, fetch_fn: Callable[[str], Dict[str, Any]],
+                 on_success: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+                 on_failure: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+                 workers: int = 2, max_attempts: int = 4, base_delay: float = 2.0,
+                 max_delay: float = 60.0, max_finished_jobs: int = 200):
+        self.fetch_fn = fetch_fn
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_finished_jobs = max_finished_jobs
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}  # 進行中的工作 {video_id: job}
+        self._finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 最近結束的工作
+        self._ready: List = []  # (priority, seq, video_id)
+        self._delayed: List = []  # (due, seq, video_id)，等待退避時間結束的工作
+        self._seq = 0
+        self._cond = threading.Condition()
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+
+        self._running = True
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"transcript-fetch-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, video_id: str, video_url: str, priority: int = PRIORITY_NORMAL) -> Dict[str, Any]:
+        """提交擷取工作；同一影片已有進行中的工作時合併，不重複呼叫 API"""
+        with self._cond:
+            job = self._jobs.get(video_id)
+            if job is not None:
+                self.coalesced += 1
+                # 較高優先級的請求提升排隊中工作的優先級
+                if priority < job['priority']:
+                    job['priority'] = priority
+                    if job['status'] == 'queued':
+                        self._push_ready(job)
+                return dict(self._format_job(job), coalesced=True)
+
+            now = datetime.now().isoformat()
+            job = {
+                'video_id': video_id,
+                'video_url': video_url,
+                'priority': priority,
+                'status': 'queued',
+                'attempts': 0,
+                'last_error': None,
+                'created_at': now,
+                'updated_at': now,
+                'next_attempt_at': None,
+                '_seq': None
+            }
+            self._jobs[video_id] = job
+            self._finished.pop(video_id, None)
+            self.submitted += 1
+            self._push_ready(job)
+            return dict(self._format_job(job), coalesced=False)
+
+    def get_job(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """獲取影片的工作狀態（進行中或最近結束）"""
+        with self._cond:
+            job = self._jobs.get(video_id) or self._finished.get(video_id)
+            return self._format_job(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """獲取所有進行中與最近結束的工作"""
+        with self._cond:
+            active = [self._format_job(job) for job in self._jobs.values()]
+            finished = [self._format_job(job) for job in reversed(self._finished.values())]
+        return active + finished
+
+    def is_active(self, video_id: str) -> bool:
+        """影片是否有尚未結束的工作"""
+        with self._cond:
+            return video_id in self._jobs
+
+    def statistics(self) -> Dict[str, Any]:
+        """獲取工作池統計"""
+        with self._cond:
+            statuses = {status: 0 for status in ACTIVE_STATUSES}
+            for job in self._jobs.values():
+                statuses[job['status']] += 1
+            return {
+                "workers": len(self._workers),
+                "max_attempts": self.max_attempts,
+                "queued": statuses['queued'],
+                "running": statuses['running'],
+                "retry_wait": statuses['retry_wait'],
+                "finishing": statuses['finishing'],
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retries": self.retries
+            }
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止工作執行緒（執行中的 API 呼叫不會被中斷）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join(timeout=timeout)
+
+    # ===== 內部工具 =====
+
+    def _push_ready(self, job: Dict[str, Any]):
+        """加入待執行佇列（呼叫端需持有鎖；舊的佇列項目以序號判斷失效）"""
+        self._seq += 1
+        job['_seq'] = self._seq
+        heapq.heappush(self._ready, (job['priority'], self._seq, job['video_id']))
+        self._cond.notify()
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """取出下一個可執行的工作，沒有時等待（呼叫端需持有鎖）"""
+        while self._running:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, video_id = heapq.heappop(self._delayed)
+                job = self._jobs.get(video_id)
+                if job is not None and job['status'] == 'retry_wait':
+                    job['status'] = 'queued'
+                    job['next_attempt_at'] = None
+                    self._push_ready(job)
+
+            while self._ready:
+                _, seq, video_id = heapq.heappop(self._ready)
+                job = self._jobs.get(video_id)
+                if job is not None and job['status'] == 'queued' and job['_seq'] == seq:
+                    return job
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(timeout)
+        return None
+
+    def _worker_loop(self):
+        """工作執行緒主迴圈"""
+        while True:
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    return
+                job['status'] = 'running'
+                job['attempts'] += 1
+                job['updated_at'] = datetime.now().isoformat()
+                video_id, video_url, attempt = job['video_id'], job['video_url'], job['attempts']
+
+            logger.info(f"Fetching transcript for video {video_id} (attempt {attempt}/{self.max_attempts})")
+            try:
+                result = self.fetch_fn(video_url)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+
+            if result.get('success'):
+                self._finish(job, 'succeeded', result)
+                continue
+
+            error = result.get('error') or 'Unknown error'
+            with self._cond:
+                job['last_error'] = error
+                job['updated_at'] = datetime.now().isoformat()
+                if attempt < self.max_attempts and self._is_retryable(result):
+                    delay = self._backoff_delay(attempt)
+                    job['status'] = 'retry_wait'
+                    job['next_attempt_at'] = datetime.fromtimestamp(time.time() + delay).isoformat()
+                    self.retries += 1
+                    self._seq += 1
+                    heapq.heappush(self._delayed, (time.monotonic() + delay, self._seq, video_id))
+                    self._cond.notify()
+                    logger.warning(f"Transcript fetch for {video_id} failed ({error}), retrying in {delay:.1f}s")
+                    continue
+
+            logger.warning(f"Transcript fetch for {video_id} failed after {attempt} attempt(s): {error}")
+            self._finish(job, 'failed', result)
+
+    def _finish(self, job: Dict[str, Any], status: str, result: Dict[str, Any]):
+        """呼叫回調後結束工作；回調執行期間工作仍算進行中，同一影片的新請求會合併而不重複擷取"""
+        with self._cond:
+            job['status'] = 'finishing'
+            job['updated_at'] = datetime.now().isoformat()
+            job['next_attempt_at'] = None
+
+        callback = self.on_success if status == 'succeeded' else self.on_failure
+        if callback:
+            try:
+                callback(job['video_id'], job['video_url'], result)
+            except Exception as e:
+                logger.error(f"Transcript fetch callback error for {job['video_id']}: {e}")
+
+        with self._cond:
+            job['status'] = status
+            job['updated_at'] = datetime.now().isoformat()
+            if status == 'succeeded':
+                self.succeeded += 1
+                job['last_error'] = None
+            else:
+                self.failed += 1
+            self._jobs.pop(job['video_id'], None)
+            self._finished[job['video_id']] = job
+            while len(self._finished) > self.max_finished_jobs:
+                self._finished.popitem(last=False)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """指數退避並加入抖動，避免同時重試"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _is_retryable(result: Dict[str, Any]) -> bool:
+        """網路錯誤、逾時、429 與 5xx 可重試；其他 4xx（例如影片沒有字幕）不重試"""
+        status_code = result.get('status_code')
+        return status_code is None or status_code == 429 or status_code >= 500
+
+    @staticmethod
+    def _format_job(job: Dict[str, Any]) -> Dict[str, Any]:
+        """格式化工作資料"""
+        return {key: value for key, value in job.items() if not key.startswith('_')}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+轉錄時間軸索引
+將轉錄片段依 offset 排序，以二分搜尋查詢「某個播放時間正在說什麼」
+"""
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptTimeline:
+    """單一影片的轉錄時間軸（毫秒）"""
+
+    def __init__(self, video_id: str, content: List[Dict[str, Any]], signature: Optional[Tuple[int, int]] = None):
+        self.video_id = video_id
+        self.signature = signature
+
+        segments = []
+        for item in content:
+            if not isinstance(item, dict) or not item.get('text'):
+                continue
+            try:
+                offset = float(item.get('offset', 0))
+                duration = float(item.get('duration', 0))
+            except (ValueError, TypeError):
+                continue
+            segments.append((offset, duration, item))
+        segments.sort(key=lambda segment: segment[0])
+
+        self.offsets = [offset for offset, _, _ in segments]
+        self.ends = [offset + duration for offset, duration, _ in segments]
+        self.segments = [item for _, _, item in segments]
+
+        # 前綴最大結束時間，處理重疊片段時可提早停止往前找
+        self._max_ends = []
+        max_end = float('-inf')
+        for end in self.ends:
+            max_end = max(max_end, end)
+            self._max_ends.append(max_end)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    @property
+    def duration_ms(self) -> float:
+        """時間軸總長度"""
+        return self._max_ends[-1] if self._max_ends else 0
+
+    def segment_at(self, time_ms: float) -> Optional[Dict[str, Any]]:
+        """獲取指定時間正在播放的片段（無則返回 None）"""
+        index = bisect_right(self.offsets, time_ms) - 1
+        if index >= 0 and time_ms < self.ends[index]:
+            return self.segments[index]
+        return None
+
+    def window(self, start_ms: float, end_ms: float) -> List[Dict[str, Any]]:
+        """獲取與 [start_ms, end_ms) 重疊的所有片段"""
+        if end_ms <= start_ms:
+            segment = self.segment_at(start_ms)
+            return [segment] if segment else []
+
+        # 從第一個結束時間晚於 start_ms 的片段開始，到第一個起點不早於 end_ms 的片段為止
+        begin = bisect_right(self._max_ends, start_ms)
+        stop = bisect_left(self.offsets, end_ms)
+        return [
+            self.segments[i] for i in range(begin, stop)
+            if self.ends[i] > start_ms
+        ]
+
+    def neighbors(self, time_ms: float) -> Dict[str, Optional[Dict[str, Any]]]:
+        """獲取指定時間前後最接近的片段"""
+        index = bisect_right(self.offsets, time_ms) - 1
+        return {
+            'previous': self.segments[index] if index >= 0 else None,
+            'next': self.segments[index + 1] if index + 1 < len(self.segments) else None
+        }
+
+
+class TranscriptTimelineIndex:
+    """各影片的時間軸快取（依檔案 mtime 自動重新載入）"""
+
+    def __init__(self, subtitles_dir: str):
+        self.subtitles_dir = subtitles_dir
+        self._timelines: Dict[str, TranscriptTimeline] = {}
+        self._lock = threading.Lock()
+
+    def get(self, video_id: str, fallback_entry: Optional[Dict[str, Any]] = None) -> Optional[TranscriptTimeline]:
+        """獲取影片時間軸，優先使用檔案，沒有檔案時使用記憶體中的轉錄"""
+        if not video_id:
+            return None
+
+        file_path = os.path.join(self.subtitles_dir, f"{video_id}.json")
+        try:
+            stat = os.stat(file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+
+        timeline = self._timelines.get(video_id)
+        if timeline is not None and timeline.signature == signature:
+            return timeline
+
+        with self._lock:
+            timeline = self._timelines.get(video_id)
+            if timeline is not None and timeline.signature == signature:
+                return timeline
+
+            transcript_entry = self._load_file(file_path) if signature else None
+            if transcript_entry is None:
+                transcript_entry = fallback_entry
+            if transcript_entry is None:
+                return None
+
+            content = (transcript_entry.get('transcript_data') or {}).get('content') or []
+            timeline = TranscriptTimeline(video_id, content, signature)
+            self._timelines[video_id] = timeline
+            logger.debug(f"Built transcript timeline for video {video_id}: {len(timeline)} segments")
+            return timeline
+
+    def invalidate(self, video_id: Optional[str] = None):
+        """清除快取"""
+        with self._lock:
+            if video_id:
+                self._timelines.pop(video_id, None)
+            else:
+                self._timelines.clear()
+
+    @staticmethod
+    def _load_file(file_path: str) -> Optional[Dict[str, Any]]:
+        """讀取轉錄檔案"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Failed to read transcript file {file_path}: {e}")
+            return None
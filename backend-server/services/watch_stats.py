@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+觀看統計累加器
+每收到一幀 YouTube 數據就以 O(1) 更新觀看時間、播放/暫停切換與跳轉次數，不依賴有上限的原始歷史
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class WatchStatsAggregator:
+    """增量式觀看統計"""
+
+    def __init__(self, max_gap_seconds: float = 10.0, seek_threshold_seconds: float = 3.0,
+                 max_videos: int = 500, max_recent_sessions: int = 50):
+        self.max_gap_seconds = max_gap_seconds  # 兩幀間隔超過此值視為中斷，不計入觀看時間
+        self.seek_threshold_seconds = seek_threshold_seconds  # 播放位置偏離預期超過此值視為跳轉
+        self.max_videos = max_videos
+
+        self._lock = threading.Lock()
+        self._last_frames: Dict[Any, Dict[str, Any]] = {}  # {tab_key: 上一幀摘要}
+        self._open_sessions: Dict[Any, Dict[str, Any]] = {}  # {tab_key: 進行中的會話}
+        self._videos: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._recent_sessions = deque(maxlen=max_recent_sessions)
+
+        self.frames = 0
+        self.total_watch_time = 0.0
+        self.sessions = 0
+        self.plays = 0
+        self.pauses = 0
+        self.seeks = 0
+        self.unique_videos = 0
+        self.longest_session = 0.0
+
+    def update(self, data: Dict[str, Any]):
+        """以一幀數據更新統計"""
+        video_id = data.get('videoId')
+        if not video_id or data.get('type') == 'stop_monitoring':
+            return
+
+        tab_key = data.get('tabId', 'default')
+        frame = {
+            'video_id': video_id,
+            'time': self._frame_time(data),
+            'position': float(data.get('currentTime') or 0),
+            'playing': bool(data.get('isPlaying', False)),
+            'rate': float(data.get('playbackRate') or 1)
+        }
+
+        with self._lock:
+            self.frames += 1
+            video = self._touch_video(video_id, data.get('title'))
+            previous = self._last_frames.get(tab_key)
+            self._last_frames[tab_key] = frame
+
+            if previous is None or previous['video_id'] != video_id:
+                # 新影片（或第一幀）：結束上一段會話
+                self._close_session(tab_key, frame['time'])
+                if frame['playing']:
+                    self._start_play(tab_key, video, frame)
+                return
+
+            elapsed = (frame['time'] - previous['time']) / 1000
+            continuous = 0 <= elapsed <= self.max_gap_seconds
+
+            if previous['playing'] and continuous:
+                self.total_watch_time += elapsed
+                video['watch_time'] += elapsed
+                session = self._open_sessions.get(tab_key)
+                if session is not None:
+                    session['watch_time'] += elapsed
+
+            if continuous:
+                expected = elapsed * previous['rate'] if previous['playing'] else 0
+                if abs(frame['position'] - previous['position'] - expected) > self.seek_threshold_seconds:
+                    self.seeks += 1
+                    video['seeks'] += 1
+
+            if previous['playing'] and not frame['playing']:
+                self.pauses += 1
+                video['pauses'] += 1
+                self._close_session(tab_key, frame['time'])
+            elif not previous['playing'] and frame['playing']:
+                self._start_play(tab_key, video, frame)
+            elif frame['playing'] and not continuous:
+                # 長時間沒有數據後繼續播放，視為新會話
+                self._close_session(tab_key, previous['time'])
+                self._start_play(tab_key, video, frame)
+
+    def forget_tab(self, tab_key: Any):
+        """標籤頁關閉時結束其會話"""
+        with self._lock:
+            previous = self._last_frames.pop(tab_key, None)
+            if previous is not None:
+                self._close_session(tab_key, previous['time'])
+
+    def snapshot(self, include_videos: bool = True) -> Dict[str, Any]:
+        """獲取統計快照"""
+        with self._lock:
+            stats = {
+                "total_videos": self.unique_videos,
+                "total_watch_time": round(self.total_watch_time, 1),
+                "sessions": self.sessions,
+                "plays": self.plays,
+                "pauses": self.pauses,
+                "seeks": self.seeks,
+                "frames": self.frames,
+                "longest_session": round(max(
+                    [self.longest_session] + [s['watch_time'] for s in self._open_sessions.values()]
+                ), 1),
+                "current_sessions": [self._format_session(s) for s in self._open_sessions.values()],
+                "recent_sessions": [self._format_session(s) for s in self._recent_sessions]
+            }
+            if include_videos:
+                stats["videos"] = {
+                    video_id: dict(video, watch_time=round(video['watch_time'], 1))
+                    for video_id, video in self._videos.items()
+                }
+            return stats
+
+    def _touch_video(self, video_id: str, title: Optional[str]) -> Dict[str, Any]:
+        """獲取影片統計並標記為最近觀看"""
+        video = self._videos.get(video_id)
+        if video is None:
+            video = {'title': title, 'watch_time': 0.0, 'plays': 0, 'pauses': 0, 'seeks': 0}
+            self._videos[video_id] = video
+            self.unique_videos += 1
+            if len(self._videos) > self.max_videos:
+                self._videos.popitem(last=False)
+        else:
+            self._videos.move_to_end(video_id)
+            if title:
+                video['title'] = title
+        return video
+
+    def _start_play(self, tab_key: Any, video: Dict[str, Any], frame: Dict[str, Any]):
+        """開始播放：計數並開啟新會話"""
+        self.plays += 1
+        video['plays'] += 1
+        self.sessions += 1
+        self._open_sessions[tab_key] = {
+            'video_id': frame['video_id'],
+            'started_at': frame['time'],
+            'ended_at': None,
+            'watch_time': 0.0
+        }
+
+    def _close_session(self, tab_key: Any, ended_at: float):
+        """結束會話並保存到最近會話列表"""
+        session = self._open_sessions.pop(tab_key, None)
+        if session is None:
+            return
+        session['ended_at'] = ended_at
+        self.longest_session = max(self.longest_session, session['watch_time'])
+        self._recent_sessions.append(session)
+
+    @staticmethod
+    def _frame_time(data: Dict[str, Any]) -> float:
+        """獲取幀的時間（毫秒）；優先使用擴展附帶的時間戳，批次上報時仍保有原始間隔"""
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, (int, float)) and timestamp > 0:
+            return float(timestamp)
+        return time.time() * 1000
+
+    @staticmethod
+    def _format_session(session: Dict[str, Any]) -> Dict[str, Any]:
+        """格式化會話資料"""
+        return dict(session, watch_time=round(session['watch_time'], 1))
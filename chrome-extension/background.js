@@ -11,6 +11,15 @@ class TabMonitor {
         this.updateInterval = null;
         this.lastVideoData = null;
         
+        // 批次/增量上報相關
+        this.batchSupported = true;
+        this.frameBuffer = [];        // 待送出的數據幀
+        this.tabFrameState = new Map(); // {tabId: {seq, data}} 伺服器已知的狀態
+        this.frameSeq = 0;
+        this.flushTimer = null;
+        this.batchDelayMs = 250;      // 收到第一幀後延遲送出，合併同時段的幀
+        this.maxBatchFrames = 20;
+        
         // 字幕預載相關
         this.subtitlePreloader = new SubtitlePreloader(this.serverUrl);
         this.processedVideos = new Set(); // 記錄已處理的視頻ID
@@ -238,8 +247,120 @@ class TabMonitor {
         
         console.log('Video data updated:', enrichedData);
         
-        // 發送到 Python 服務器
-        this.sendToServer(enrichedData);
+        // 加入批次佇列，以增量幀發送到 Python 服務器
+        this.enqueueFrame(enrichedData);
+    }
+    
+    enqueueFrame(data) {
+        if (!this.batchSupported) {
+            this.sendToServer(data);
+            return;
+        }
+        
+        const tabId = data.tabId;
+        const seq = ++this.frameSeq;
+        const previous = this.tabFrameState.get(tabId);
+        let frame;
+        
+        if (previous) {
+            // 只送出變更的欄位
+            const changed = {};
+            const removed = [];
+            for (const [key, value] of Object.entries(data)) {
+                if (JSON.stringify(previous.data[key]) !== JSON.stringify(value)) {
+                    changed[key] = value;
+                }
+            }
+            for (const key of Object.keys(previous.data)) {
+                if (!(key in data)) {
+                    removed.push(key);
+                }
+            }
+            frame = { tabId, seq, kind: 'delta', base: previous.seq, data: changed };
+            if (removed.length > 0) {
+                frame.removed = removed;
+            }
+        } else {
+            frame = { tabId, seq, kind: 'full', data };
+        }
+        
+        this.tabFrameState.set(tabId, { seq, data });
+        this.frameBuffer.push({ frame, fullData: data });
+        
+        if (this.frameBuffer.length >= this.maxBatchFrames) {
+            this.flushFrames();
+        } else if (!this.flushTimer) {
+            this.flushTimer = setTimeout(() => this.flushFrames(), this.batchDelayMs);
+        }
+    }
+    
+    async flushFrames() {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+        if (this.frameBuffer.length === 0) return;
+        
+        const pending = this.frameBuffer;
+        this.frameBuffer = [];
+        const url = `${this.serverUrl}/api/youtube/batch`;
+        const lastData = pending[pending.length - 1].fullData;
+        
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ frames: pending.map(item => item.frame) })
+            });
+            
+            if (response.status === 404) {
+                // 舊版服務器不支援批次上報，改回逐筆發送完整數據
+                console.warn('Batch endpoint not available, falling back to /api/youtube');
+                this.batchSupported = false;
+                this.tabFrameState.clear();
+                for (const item of pending) {
+                    await this.sendToServer(item.fullData);
+                }
+                return;
+            }
+            
+            await this.saveDataLog({
+                timestamp: Date.now(),
+                data: lastData,
+                status: response.ok ? 'success' : 'failed',
+                statusText: response.ok ? `OK (${pending.length} frames)` : `${response.status} ${response.statusText}`,
+                url: url
+            });
+            
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            
+            const result = await response.json();
+            
+            // 伺服器無法套用增量幀的標籤頁，下次改送完整幀
+            for (const tabId of result.resync || []) {
+                this.tabFrameState.delete(tabId);
+            }
+            
+            console.log('Batch sent to server successfully:', result);
+            
+        } catch (error) {
+            console.error('Error sending batch to server:', error);
+            
+            // 無法確認伺服器狀態，下次全部改送完整幀
+            this.tabFrameState.clear();
+            
+            await this.saveDataLog({
+                timestamp: Date.now(),
+                data: lastData,
+                status: 'error',
+                statusText: error.message,
+                url: url
+            });
+        }
     }
     
     async sendToServer(data) {
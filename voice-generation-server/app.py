@@ -1,25 +1,98 @@
 from flask import Flask, request, jsonify
 import datetime
 import os
-import wave
 import logging
+import json
 import requests
 import threading
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, List, Optional
+
+from audio_cache import AudioCache
+from engines import Synthesizer
+from job_queue import VoiceJobQueue, QueueFullError
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# 確保輸出目錄存在
+# 輸出目錄（第一次生成時建立）
 OUTPUT_DIR = "generated_audio"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # 配置
 BACKEND_SERVER_CALLBACK_URL = "http://localhost:3000/api/voice_generation_complete"
 
+# 語音快取目錄（放在輸出目錄內，符號連結解析後仍在輸出目錄中）；VOICE_AUDIO_CACHE=0 停用
+AUDIO_CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+AUDIO_CACHE_ENABLED = os.environ.get("VOICE_AUDIO_CACHE", "1") != "0"
+
+# 角色回應檔案目錄（message_gen 生成的 avatar_talk/<video_id>.json）
+AVATAR_TALK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "windows-app", "src", "data", "avatar_talk")
+
+# 語音合成引擎與執行模式（thread：在工作執行緒中合成；process：在程序池中合成，可使用所有 CPU 核心）
+VOICE_ENGINE = os.environ.get("VOICE_ENGINE", "silence")
+VOICE_EXECUTION = os.environ.get("VOICE_EXECUTION", "thread")
+VOICE_PROCESSES = int(os.environ.get("VOICE_PROCESSES", 0)) or (os.cpu_count() or 1)
+
+# 語音生成的工作執行緒數與佇列容量（process 模式下工作執行緒只負責分派，預設與程序數相同）
+DEFAULT_WORKERS = VOICE_PROCESSES if VOICE_EXECUTION == "process" else min(4, os.cpu_count() or 1)
+VOICE_WORKERS = max(1, int(os.environ.get("VOICE_WORKERS", DEFAULT_WORKERS)))
+VOICE_QUEUE_SIZE = max(1, int(os.environ.get("VOICE_QUEUE_SIZE", 200)))
+# 每句語音的預估生成時間（秒），用於回報預計時間
+ESTIMATED_SECONDS_PER_LINE = 0.5
+
+batch_jobs: Dict[str, Dict[str, Any]] = {}  # {job_id: 批次工作狀態}
+active_batch_by_video: Dict[str, str] = {}  # {video_id: 進行中的 job_id}
+MAX_BATCH_JOBS = 200  # 保留的批次工作紀錄數
+batch_lock = threading.Lock()
+avatar_talk_locks: Dict[str, threading.Lock] = {}  # 每個影片的 avatar_talk 檔案寫入鎖
+
+# 以下元件都在第一次使用時建立：process 模式以 spawn 啟動的工作程序會重新匯入本模組，
+# 匯入時建立會讓每個工作程序各自啟動閒置的工作佇列與快取
+synthesizer = None
+synthesizer_lock = threading.Lock()
+voice_queue = None
+audio_cache = None
+runtime_lock = threading.Lock()
+
+def get_synthesizer() -> Synthesizer:
+    """
+    獲取語音合成器（第一次使用時建立）
+    """
+    global synthesizer
+    with synthesizer_lock:
+        if synthesizer is None:
+            synthesizer = Synthesizer(VOICE_ENGINE, VOICE_EXECUTION, VOICE_PROCESSES)
+        return synthesizer
+
+def get_voice_queue() -> VoiceJobQueue:
+    """
+    獲取語音生成工作佇列（第一次使用時建立並啟動工作執行緒）
+    """
+    global voice_queue
+    with runtime_lock:
+        if voice_queue is None:
+            voice_queue = VoiceJobQueue(
+                workers=VOICE_WORKERS,
+                max_queue=VOICE_QUEUE_SIZE,
+                estimated_seconds_per_job=ESTIMATED_SECONDS_PER_LINE
+            )
+        return voice_queue
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """
+    獲取語音快取（第一次使用時建立快取目錄）；停用時返回 None
+    """
+    global audio_cache
+    if not AUDIO_CACHE_ENABLED:
+        return None
+    with runtime_lock:
+        if audio_cache is None:
+            audio_cache = AudioCache(AUDIO_CACHE_DIR)
+        return audio_cache
+
 def generate_voice_file(log_data: Dict[str, Any]) -> str:
     """
-    生成空的 WAV 檔案
+    以設定的語音合成引擎生成 WAV 檔案
     """
     try:
         timestamp = log_data['timestamp']
@@ -32,23 +105,26 @@ def generate_voice_file(log_data: Dict[str, Any]) -> str:
         current_time = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{video_id}_{logs_id}_{timestamp}_{current_time}.wav"
         filepath = os.path.join(OUTPUT_DIR, filename)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
         
-        # 生成空的音頻數據 (3秒的靜音)
-        sample_rate = 44100
-        duration = 3  # 3秒
-        
-        # 創建靜音音頻數據 (全為0的16位整數)
-        num_samples = int(sample_rate * duration)
-        audio_data = bytes([0, 0] * num_samples)  # 每個樣本 2 bytes (16-bit)
-        
-        # 寫入 WAV 檔案
-        with wave.open(filepath, 'wb') as wav_file:
-            wav_file.setnchannels(1)  # 單聲道
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(audio_data)
+        # 合成語音並寫入 WAV 檔案；相同台詞與設定直接連結到快取中的檔案
+        synth = get_synthesizer()
+        text = log_data.get('message', '')
+        emotion = log_data.get('emotion', '')
+        cache = get_audio_cache()
+        if cache is None:
+            synth.synthesize_to_file(text, emotion, filepath)
+            cached = False
+        else:
+            key = AudioCache.make_key(
+                text, log_data.get('voice', ''), emotion,
+                synth.engine_name, synth.version, synth.audio_format
+            )
+            cached = cache.materialize(
+                key, filepath, lambda path: synth.synthesize_to_file(text, emotion, path)
+            )
         
-        logging.info(f"語音檔案生成完成: {filename}")
+        logging.info(f"語音檔案生成完成: {filename}" + ("（使用快取）" if cached else ""))
         
         return filepath
         
@@ -103,6 +179,7 @@ def process_voice_generation_async(log_data: Dict[str, Any]):
     finally:
         # 回報給 backend server
         notify_backend_server(log_data, filepath, success, error_message)
+    return success
 
 @app.route('/api/generate_voice', methods=['POST'])
 def generate_voice():
@@ -120,17 +197,21 @@ def generate_voice():
         
         logging.info(f"收到語音生成請求: {log_data['logs_id']}")
         
-        # 啟動異步處理
-        thread = threading.Thread(
-            target=process_voice_generation_async,
-            args=(log_data,),
-            daemon=True
-        )
-        thread.start()
+        # 加入工作佇列，由固定數量的工作執行緒處理
+        try:
+            job = get_voice_queue().submit(
+                lambda: process_voice_generation_async(log_data),
+                kind='single',
+                meta={'video_id': log_data['video_id'], 'logs_id': log_data['logs_id']}
+            )
+        except QueueFullError as e:
+            return _queue_full_response(e)
         
         return jsonify({
             'message': '語音生成已開始',
+            'job_id': job['job_id'],
             'logs_id': log_data['logs_id'],
+            'queue_depth': get_voice_queue().statistics()['queue_depth'],
             'estimated_duration': '至少 10 秒'
         }), 202  # 202 Accepted
         
@@ -138,6 +219,208 @@ def generate_voice():
         logging.error(f"處理語音生成請求時發生錯誤: {e}")
         return jsonify({'error': '內部服務器錯誤'}), 500
 
+def _queue_full_response(error: QueueFullError):
+    """佇列已滿時的 429 回應"""
+    logging.warning(f"語音生成佇列已滿，拒絕請求（{error.retry_after} 秒後重試）")
+    response = jsonify({
+        'error': str(error),
+        'retry_after': error.retry_after,
+        'queue': get_voice_queue().statistics()
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def _avatar_talk_path(video_id: str) -> str:
+    """avatar_talk 檔案路徑"""
+    return os.path.join(AVATAR_TALK_DIR, f"{video_id}.json")
+
+def _get_avatar_talk_lock(video_id: str) -> threading.Lock:
+    """獲取影片 avatar_talk 檔案的寫入鎖"""
+    with batch_lock:
+        return avatar_talk_locks.setdefault(video_id, threading.Lock())
+
+def _load_avatar_talk(video_id: str) -> List[Dict[str, Any]]:
+    """讀取影片的角色回應列表"""
+    with open(_avatar_talk_path(video_id), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_avatar_talk(video_id: str, entries: List[Dict[str, Any]]):
+    """原子寫入角色回應列表（暫存檔 + os.replace）"""
+    file_path = _avatar_talk_path(video_id)
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, file_path)
+
+def _needs_voice(entry: Dict[str, Any]) -> bool:
+    """角色回應是否還需要生成語音"""
+    if not entry.get('Reply'):
+        return False
+    file_path = entry.get('file_path')
+    return not (entry.get('is_generated') and file_path and os.path.exists(os.path.join(OUTPUT_DIR, file_path)))
+
+def _mark_line_generated(video_id: str, entry_time: Any, reply: str, filename: str):
+    """將生成完成的語音檔寫回 avatar_talk 對應的條目"""
+    with _get_avatar_talk_lock(video_id):
+        entries = _load_avatar_talk(video_id)
+        for entry in entries:
+            if entry.get('time') == entry_time and entry.get('Reply') == reply:
+                entry['file_path'] = filename
+                entry['is_generated'] = True
+                break
+        _write_avatar_talk(video_id, entries)
+
+def _trim_batch_jobs():
+    """只保留最近的已完成批次工作紀錄（呼叫端需持有 batch_lock）"""
+    finished = [job_id for job_id, job in batch_jobs.items() if job['finished_at']]
+    for job_id in finished[:max(0, len(batch_jobs) - MAX_BATCH_JOBS)]:
+        del batch_jobs[job_id]
+
+def _format_batch_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """格式化批次工作狀態"""
+    return {
+        **job,
+        'remaining': job['total'] - job['completed'] - job['failed']
+    }
+
+def synthesize_batch_line(job_id: str, video_id: str, entry: Dict[str, Any]):
+    """生成批次中的一句語音（在語音工作佇列中運行）"""
+    error_message = None
+    try:
+        log_data = {
+            'timestamp': entry.get('time'),
+            'emotion': entry.get('emotion', ''),
+            'message': entry.get('Reply', ''),
+            'voice': entry.get('character', ''),
+            'video_id': video_id,
+            'logs_id': f"batch{job_id}"
+        }
+        filepath = generate_voice_file(log_data)
+        _mark_line_generated(video_id, entry.get('time'), entry.get('Reply'), os.path.basename(filepath))
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"批次語音生成失敗 ({video_id} @ {entry.get('time')}): {e}")
+    
+    with batch_lock:
+        job = batch_jobs[job_id]
+        if error_message:
+            job['failed'] += 1
+            job['errors'].append({'time': entry.get('time'), 'error': error_message})
+        else:
+            job['completed'] += 1
+        
+        if job['completed'] + job['failed'] >= job['total']:
+            job['status'] = 'completed' if job['failed'] == 0 else 'completed_with_errors'
+            job['finished_at'] = datetime.datetime.now().isoformat()
+            active_batch_by_video.pop(video_id, None)
+            logging.info(f"批次語音生成完成: {video_id} ({job['completed']}/{job['total']} 成功)")
+    return error_message is None
+
+@app.route('/api/generate_voice_batch', methods=['POST'])
+def generate_voice_batch():
+    """
+    為影片的所有角色回應生成語音（讀取 avatar_talk/<video_id>.json）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        video_id = data.get('video_id')
+        if not video_id:
+            return jsonify({'error': '缺少必要欄位: video_id'}), 400
+        
+        if not os.path.exists(_avatar_talk_path(video_id)):
+            return jsonify({'error': f'找不到角色回應檔案: avatar_talk/{video_id}.json'}), 404
+        
+        with _get_avatar_talk_lock(video_id):
+            entries = _load_avatar_talk(video_id)
+        pending = [entry for entry in entries if _needs_voice(entry)]
+        
+        with batch_lock:
+            # 同一影片已有進行中的批次時直接返回該批次
+            job_id = active_batch_by_video.get(video_id)
+            if job_id:
+                job = batch_jobs[job_id]
+                return jsonify({
+                    'message': '該影片的批次語音生成已在進行中',
+                    **_format_batch_job(job),
+                    'estimated_duration': f"約 {job['estimated_seconds']:.0f} 秒"
+                }), 202
+            
+            estimated_seconds = len(pending) * ESTIMATED_SECONDS_PER_LINE / VOICE_WORKERS
+            job_id = uuid.uuid4().hex[:12]
+            now = datetime.datetime.now().isoformat()
+            job = {
+                'job_id': job_id,
+                'video_id': video_id,
+                'status': 'running' if pending else 'completed',
+                'response_count': len(entries),
+                'total': len(pending),
+                'completed': 0,
+                'failed': 0,
+                'errors': [],
+                'estimated_seconds': estimated_seconds,
+                'created_at': now,
+                'finished_at': None if pending else now
+            }
+            batch_jobs[job_id] = job
+            
+            # 整批一次保留佇列容量，容量不足時整批拒絕，避免只生成一部分
+            try:
+                get_voice_queue().submit_many(
+                    [lambda entry=entry: synthesize_batch_line(job_id, video_id, entry) for entry in pending],
+                    kind='batch',
+                    metas=[{'video_id': video_id, 'batch_id': job_id, 'time': entry.get('time')} for entry in pending]
+                )
+            except QueueFullError as e:
+                del batch_jobs[job_id]
+                return _queue_full_response(e)
+            
+            if pending:
+                active_batch_by_video[video_id] = job_id
+            _trim_batch_jobs()
+        
+        logging.info(f"收到批次語音生成請求: {video_id}，共 {len(entries)} 句，待生成 {len(pending)} 句")
+        
+        return jsonify({
+            'message': '批次語音生成已開始' if pending else '所有語音皆已生成',
+            'job_id': job_id,
+            'video_id': video_id,
+            'response_count': len(entries),
+            'pending_count': len(pending),
+            'estimated_duration': f"約 {estimated_seconds:.0f} 秒"
+        }), 202  # 202 Accepted
+        
+    except Exception as e:
+        logging.error(f"處理批次語音生成請求時發生錯誤: {e}")
+        return jsonify({'error': '內部服務器錯誤'}), 500
+
+@app.route('/api/generate_voice_batch/<job_id>', methods=['GET'])
+def get_voice_batch_status(job_id):
+    """
+    查詢批次語音生成進度
+    """
+    with batch_lock:
+        job = batch_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': f'找不到批次工作: {job_id}'}), 404
+        return jsonify(_format_batch_job(job)), 200
+
+@app.route('/api/jobs', methods=['GET'])
+def get_queue_statistics():
+    """
+    查詢語音生成佇列深度與工作執行緒使用率
+    """
+    return jsonify(get_voice_queue().statistics()), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_voice_job_status(job_id):
+    """
+    查詢單一語音生成工作狀態
+    """
+    job = get_voice_queue().get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'找不到工作: {job_id}'}), 404
+    return jsonify(job), 200
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
@@ -146,7 +429,10 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'voice-generation-server',
-        'output_directory': OUTPUT_DIR
+        'output_directory': OUTPUT_DIR,
+        'synthesizer': get_synthesizer().info(),
+        'audio_cache': get_audio_cache().statistics() if AUDIO_CACHE_ENABLED else None,
+        'queue': get_voice_queue().statistics()
     }), 200
 
 @app.route('/api/files', methods=['GET'])
@@ -0,0 +1,119 @@
+"""
+語音內容定址快取
+以 (文字, 聲音, 情感, 引擎, 引擎版本, 音訊格式) 的雜湊值保存合成結果；相同台詞不再重新合成，
+各影片的檔名以硬連結指向快取檔（不支援時改用符號連結，最後才複製），不佔用額外磁碟空間
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List
+
+
+class AudioCache:
+    """語音內容定址快取"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, List[Any]] = {}  # {key: [鎖, 使用中的數量]}
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.links = {'hardlink': 0, 'symlink': 0, 'copy': 0}
+
+    @staticmethod
+    def make_key(text: str, voice: str, emotion: str, engine: str, version: str, audio_format: str) -> str:
+        """快取鍵：合成輸入與引擎設定的 SHA-256"""
+        payload = json.dumps([text, voice, emotion, engine, version, audio_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """快取檔路徑"""
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def materialize(self, key: str, target_path: str, synthesize_fn: Callable[[str], Any]) -> bool:
+        """
+        將快取的語音放到 target_path；快取中沒有時先以 synthesize_fn(path) 合成到快取
+        返回是否命中快取
+        """
+        cache_path = self.path_for(key)
+        with self._key_lock(key):
+            hit = os.path.exists(cache_path)
+            if not hit:
+                # 先寫到暫存檔再改名，中斷時不會留下不完整的快取檔
+                temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    synthesize_fn(temp_path)
+                    os.replace(temp_path, cache_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+
+        method = self._link(cache_path, target_path)
+        with self._lock:
+            self.links[method] += 1
+            if hit:
+                self.hits += 1
+                # 複製時仍佔用一份磁碟空間，不計入節省量
+                if method != 'copy':
+                    self.bytes_saved += os.path.getsize(cache_path)
+            else:
+                self.misses += 1
+        return hit
+
+    def statistics(self) -> Dict[str, Any]:
+        """快取統計"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cache_dir': self.cache_dir,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'links': dict(self.links)
+            }
+
+    # ===== 內部工具 =====
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """同一個快取鍵同時只合成一次；沒有人使用的鎖會被移除"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def _link(self, cache_path: str, target_path: str) -> str:
+        """以硬連結、符號連結或複製建立目標檔案，返回使用的方式"""
+        temp_path = f"{target_path}.{threading.get_ident()}.tmp"
+        try:
+            os.link(cache_path, temp_path)
+            method = 'hardlink'
+        except OSError:
+            try:
+                # 相對路徑的符號連結，解析後仍在輸出目錄內
+                os.symlink(os.path.relpath(cache_path, os.path.dirname(target_path) or '.'), temp_path)
+                method = 'symlink'
+            except OSError as e:
+                logging.debug(f"無法建立連結，改為複製: {e}")
+                shutil.copyfile(cache_path, temp_path)
+                method = 'copy'
+        os.replace(temp_path, target_path)
+        return method
+
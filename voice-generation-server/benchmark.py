@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+語音合成基準測試
+以不同的批次大小同時合成多句語音（包含寫入 WAV 檔案），回報即時率（RTF = 合成耗時 / 音訊長度）與每秒樣本數
+
+用法: python benchmark.py --engine tone --max-batch 8 [--execution process] [--processes 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from engines import Synthesizer, EXECUTION_MODES
+
+# 測試用台詞（長短混合的角色回應）
+SAMPLE_LINES = [
+    ("對", "友善的"),
+    ("哈哈這個太好笑了吧", "興奮的"),
+    ("這一段的重點是把問題拆成幾個小步驟再逐一處理", "專業的"),
+    ("嗯，慢慢來就好，不用急", "平靜的"),
+    ("Wait, did he just say that? 真的假的", "興奮的"),
+    ("我覺得這個說明很清楚，大家應該都聽得懂", "友善的"),
+]
+
+
+def run_batch(synthesizer: Synthesizer, batch_size: int, output_dir: str, round_id: int):
+    """同時合成 batch_size 句，返回 (耗時秒數, 總樣本數, 取樣率)"""
+    lines = [SAMPLE_LINES[i % len(SAMPLE_LINES)] for i in range(batch_size)]
+    paths = [os.path.join(output_dir, f"bench_{round_id}_{i}.wav") for i in range(batch_size)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=batch_size) as executor:
+        list(executor.map(lambda args: synthesizer.synthesize_to_file(*args), [
+            (text, emotion, path) for (text, emotion), path in zip(lines, paths)
+        ]))
+    elapsed = time.perf_counter() - started
+
+    samples = 0
+    sample_rate = 0
+    for path in paths:
+        with wave.open(path, 'rb') as wav_file:
+            samples += wav_file.getnframes()
+            sample_rate = wav_file.getframerate()
+        os.remove(path)
+    return elapsed, samples, sample_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="語音合成基準測試")
+    parser.add_argument('--engine', default=os.environ.get("VOICE_ENGINE", "tone"), help="語音合成引擎")
+    parser.add_argument('--execution', default=os.environ.get("VOICE_EXECUTION", "thread"),
+                        choices=EXECUTION_MODES, help="執行模式")
+    parser.add_argument('--processes', type=int, default=0, help="process 模式的工作程序數（預設為 CPU 核心數）")
+    parser.add_argument('--max-batch', type=int, default=8, help="測試的最大批次大小（從 1 測到此值）")
+    parser.add_argument('--repeat', type=int, default=3, help="每個批次大小重複次數（取最快的一次）")
+    args = parser.parse_args()
+
+    synthesizer = Synthesizer(args.engine, args.execution, args.processes or None)
+    info = synthesizer.info()
+    print(f"🎙️ 引擎: {info['engine']} v{info['version']}，執行模式: {info['execution']}"
+          + (f"（{info['processes']} 個工作程序）" if info['processes'] else ""))
+    print(f"{'批次':>4} {'耗時(秒)':>9} {'音訊(秒)':>9} {'RTF':>8} {'樣本/秒':>12} {'句/秒':>8}")
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            # 預熱（載入引擎、建立執行緒）
+            run_batch(synthesizer, 1, output_dir, -1)
+
+            round_id = 0
+            for batch_size in range(1, args.max_batch + 1):
+                best = None
+                for _ in range(max(1, args.repeat)):
+                    result = run_batch(synthesizer, batch_size, output_dir, round_id)
+                    round_id += 1
+                    if best is None or result[0] < best[0]:
+                        best = result
+
+                elapsed, samples, sample_rate = best
+                audio_seconds = samples / sample_rate
+                print(f"{batch_size:>4} {elapsed:>9.3f} {audio_seconds:>9.2f} {elapsed / audio_seconds:>8.4f} "
+                      f"{samples / elapsed:>12,.0f} {batch_size / elapsed:>8.1f}")
+    finally:
+        synthesizer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
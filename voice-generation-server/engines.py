@@ -0,0 +1,219 @@
+"""
+語音合成引擎
+SynthesisEngine 定義引擎介面，以 register_engine 註冊並依名稱建立；
+Synthesizer 可在目前程序內（thread）或在程序池中（process）執行引擎，程序池的每個工作程序只載入一次引擎
+"""
+
+import abc
+import logging
+import multiprocessing
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Type, Union
+
+import numpy as np
+
+EXECUTION_MODES = ('thread', 'process')
+
+# 程序池預熱時等待所有工作程序就緒的最長秒數（包含載入引擎）
+WARM_UP_TIMEOUT = 120
+
+
+class SynthesisEngine(abc.ABC):
+    """語音合成引擎介面"""
+
+    name = 'base'
+    version = '0'
+    sample_rate = 44100
+
+    def load(self):
+        """載入模型等耗時資源；每個程序只呼叫一次"""
+
+    @abc.abstractmethod
+    def synthesize(self, text: str, emotion: str = '') -> Union[bytes, np.ndarray]:
+        """將文字合成為 16-bit 單聲道 PCM（bytes 或 int16 陣列）"""
+
+
+ENGINES: Dict[str, Type[SynthesisEngine]] = {}
+
+
+def register_engine(engine_class: Type[SynthesisEngine]) -> Type[SynthesisEngine]:
+    """註冊語音合成引擎（可作為類別裝飾器）"""
+    ENGINES[engine_class.name] = engine_class
+    return engine_class
+
+
+def create_engine(name: str) -> SynthesisEngine:
+    """依名稱建立並載入引擎"""
+    engine_class = ENGINES.get(name)
+    if engine_class is None:
+        raise ValueError(f"未知的語音合成引擎: {name}（可用: {', '.join(sorted(ENGINES))}）")
+    engine = engine_class()
+    engine.load()
+    logging.info(f"語音合成引擎已載入: {engine.name} v{engine.version} (pid {os.getpid()})")
+    return engine
+
+
+@register_engine
+class SilenceEngine(SynthesisEngine):
+    """生成固定 3 秒靜音"""
+
+    name = 'silence'
+    version = '1'
+    duration = 3  # 秒
+
+    def synthesize(self, text: str, emotion: str = '') -> bytes:
+        # 創建靜音音頻數據 (全為0的16位整數，每個樣本 2 bytes)
+        num_samples = int(self.sample_rate * self.duration)
+        return bytes(2 * num_samples)
+
+
+@register_engine
+class ToneEngine(SynthesisEngine):
+    """NumPy 參考合成器：每個字元一個音高固定的短音，時長與文字長度成正比，相同輸入產生相同音訊"""
+
+    name = 'tone'
+    version = '1'
+    seconds_per_char = 0.18
+    min_duration = 0.5  # 秒
+    max_duration = 15.0  # 秒
+    release = 0.015  # 每個字元音頭與音尾的淡入淡出時間（秒）
+
+    # 情感 -> (基頻 Hz, 振幅, 調製頻率 Hz)
+    EMOTION_TONES = {
+        '友善的': (440.0, 0.3, 5.0),
+        '專業的': (350.0, 0.25, 2.0),
+        '興奮的': (500.0, 0.4, 8.0),
+        '平靜的': (300.0, 0.2, 1.0),
+    }
+    DEFAULT_TONE = (400.0, 0.3, 3.0)
+
+    def synthesize(self, text: str, emotion: str = '') -> np.ndarray:
+        base_freq, amplitude, modulation = self.EMOTION_TONES.get(emotion, self.DEFAULT_TONE)
+        chars = np.array([ord(char) for char in (text or '')], dtype=np.int64)
+
+        duration = min(max(len(chars) * self.seconds_per_char, self.min_duration), self.max_duration)
+        num_samples = int(self.sample_rate * duration)
+        if len(chars) == 0:
+            return np.zeros(num_samples, dtype=np.int16)
+
+        # 每個樣本所屬的字元；字元超過最長時長時平均壓縮
+        char_index = np.arange(num_samples, dtype=np.int64) * len(chars) // num_samples
+        # 字元碼決定音高（基頻上的 0~11 個半音），空白與標點為靜音
+        semitones = chars % 12
+        voiced = np.array([char.isalnum() for char in text], dtype=bool)
+        char_freqs = base_freq * np.power(2.0, semitones / 12.0)
+
+        freqs = char_freqs[char_index]
+        phase = 2.0 * np.pi * np.cumsum(freqs) / self.sample_rate
+        t = np.arange(num_samples, dtype=np.float64) / self.sample_rate
+
+        # 每個字元的淡入淡出包絡，避免字元交界處的爆音
+        char_starts = np.searchsorted(char_index, np.arange(len(chars)))
+        char_ends = np.append(char_starts[1:], num_samples)
+        ramp = max(1, int(self.sample_rate * self.release))
+        since_start = np.arange(num_samples) - char_starts[char_index]
+        until_end = char_ends[char_index] - np.arange(num_samples)
+        envelope = np.clip(np.minimum(since_start, until_end) / ramp, 0.0, 1.0) * voiced[char_index]
+
+        wave_data = np.sin(phase) * envelope * (1.0 + 0.2 * np.sin(2.0 * np.pi * modulation * t))
+        return (wave_data * (amplitude / 1.2 * 32767)).astype(np.int16)
+
+
+def write_wav(filepath: str, pcm: Union[bytes, np.ndarray], sample_rate: int):
+    """寫入 16-bit 單聲道 WAV 檔案（int16 陣列直接以緩衝區寫入，不轉成 Python 物件）"""
+    with wave.open(filepath, 'wb') as wav_file:
+        wav_file.setnchannels(1)  # 單聲道
+        wav_file.setsampwidth(2)  # 16-bit
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+
+
+# ===== 程序池工作程序 =====
+
+_worker_engine: Optional[SynthesisEngine] = None
+_warm_up_barrier = None
+
+
+def _init_worker(engine_name: str, warm_up_barrier):
+    """工作程序初始化：載入引擎一次，之後的工作重複使用"""
+    global _worker_engine, _warm_up_barrier
+    _worker_engine = create_engine(engine_name)
+    _warm_up_barrier = warm_up_barrier
+
+
+def _warm_up() -> int:
+    """預熱工作：所有預熱工作同時到達屏障才返回，因此每個工作必定在不同的工作程序中執行"""
+    _warm_up_barrier.wait(timeout=WARM_UP_TIMEOUT)
+    return os.getpid()
+
+
+def _render_in_worker(text: str, emotion: str, filepath: str) -> str:
+    """在工作程序中合成並直接寫入檔案，避免將音訊資料傳回主程序"""
+    write_wav(filepath, _worker_engine.synthesize(text, emotion), _worker_engine.sample_rate)
+    return filepath
+
+
+class Synthesizer:
+    """以指定的執行模式執行語音合成引擎"""
+
+    def __init__(self, engine_name: str = 'silence', execution: str = 'thread',
+                 processes: Optional[int] = None):
+        if execution not in EXECUTION_MODES:
+            raise ValueError(f"未知的執行模式: {execution}（可用: {', '.join(EXECUTION_MODES)}）")
+
+        self.engine_name = engine_name
+        self.execution = execution
+        self.processes = 0
+        self._engine: Optional[SynthesisEngine] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        if execution == 'thread':
+            self._engine = create_engine(engine_name)
+            self.version = self._engine.version
+            self.audio_format = f"wav-pcm16-mono-{self._engine.sample_rate}"
+            return
+
+        # 先在主程序檢查引擎名稱，避免工作程序初始化失敗後整個程序池失效
+        if engine_name not in ENGINES:
+            raise ValueError(f"未知的語音合成引擎: {engine_name}（可用: {', '.join(sorted(ENGINES))}）")
+        self.version = ENGINES[engine_name].version
+        self.audio_format = f"wav-pcm16-mono-{ENGINES[engine_name].sample_rate}"
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        # spawn：主程序已有工作執行緒，fork 可能複製到被鎖住的鎖
+        context = multiprocessing.get_context('spawn')
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(engine_name, context.Barrier(self.processes))
+        )
+        # 預先啟動所有工作程序，第一批請求不必等待載入引擎；
+        # 預熱工作在屏障上互相等待，每個工作程序各執行一個
+        futures = [self._pool.submit(_warm_up) for _ in range(self.processes)]
+        pids = {future.result() for future in futures}
+        logging.info(f"語音合成程序池已啟動: {len(pids)}/{self.processes} 個工作程序")
+
+    def synthesize_to_file(self, text: str, emotion: str, filepath: str) -> str:
+        """合成語音並寫入 WAV 檔案"""
+        if self._pool is not None:
+            return self._pool.submit(_render_in_worker, text, emotion, filepath).result()
+        write_wav(filepath, self._engine.synthesize(text, emotion), self._engine.sample_rate)
+        return filepath
+
+    def info(self) -> Dict[str, Any]:
+        """引擎與執行模式資訊"""
+        return {
+            'engine': self.engine_name,
+            'version': self.version,
+            'format': self.audio_format,
+            'execution': self.execution,
+            'processes': self.processes
+        }
+
+    def shutdown(self):
+        """關閉程序池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
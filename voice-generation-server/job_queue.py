@@ -0,0 +1,176 @@
+"""
+語音生成工作佇列
+固定數量的工作執行緒從有界佇列取出工作；佇列已滿時拒絕新工作，由呼叫端回應 429
+超過佇列容量的批次在佇列清空時整批接受，避免大批次永遠無法加入
+"""
+
+import datetime
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+
+class QueueFullError(Exception):
+    """佇列容量不足"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"語音生成佇列已滿，請於 {retry_after} 秒後重試")
+        self.retry_after = retry_after
+
+
+class VoiceJobQueue:
+    """有界語音生成工作佇列"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 100,
+                 estimated_seconds_per_job: float = 0.5, max_finished_jobs: int = 500):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.max_finished_jobs = max_finished_jobs
+
+        # 容量由 submit_many 檢查（大批次可在佇列清空時超過容量），佇列本身不設上限
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._tasks: Dict[str, Callable[[], Any]] = {}  # {job_id: 待執行的工作}
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # {job_id: 工作狀態}
+        self._lock = threading.Lock()
+
+        # 統計
+        self._started_at = time.monotonic()
+        self._avg_seconds = estimated_seconds_per_job  # 工作耗時的指數移動平均
+        self.busy_workers = 0
+        self.busy_seconds = 0.0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"voice-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, task: Callable[[], Any], kind: str = 'single',
+               meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """提交一個工作；佇列已滿時拋出 QueueFullError"""
+        return self.submit_many([task], kind, [meta])[0]
+
+    def submit_many(self, tasks: List[Callable[[], Any]], kind: str = 'batch',
+                    metas: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """一次提交多個工作；剩餘容量不足以容納全部工作時一個也不加入
+        （工作數超過佇列容量時，只要佇列是空的就整批接受）"""
+        metas = metas or [None] * len(tasks)
+        with self._lock:
+            depth = self._queue.qsize()
+            oversized = len(tasks) > self.max_queue
+            if (oversized and depth > 0) or (not oversized and depth + len(tasks) > self.max_queue):
+                self.rejected += len(tasks)
+                raise QueueFullError(self._retry_after(len(tasks)))
+
+            now = datetime.datetime.now().isoformat()
+            jobs = []
+            for task, meta in zip(tasks, metas):
+                job_id = uuid.uuid4().hex[:12]
+                job = {
+                    'job_id': job_id,
+                    'kind': kind,
+                    'status': 'queued',
+                    'meta': meta or {},
+                    'error': None,
+                    'created_at': now,
+                    'started_at': None,
+                    'finished_at': None
+                }
+                self._jobs[job_id] = job
+                self._tasks[job_id] = task
+                self._queue.put_nowait(job_id)
+                jobs.append(dict(job))
+            self.submitted += len(tasks)
+            self._trim_finished()
+            return jobs
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """獲取工作狀態"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def statistics(self) -> Dict[str, Any]:
+        """佇列深度與工作執行緒使用率"""
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started_at, 1e-6)
+            return {
+                'workers': self.workers,
+                'busy_workers': self.busy_workers,
+                'utilization': round(self.busy_workers / self.workers, 3),
+                'average_utilization': round(min(1.0, self.busy_seconds / (elapsed * self.workers)), 3),
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self.max_queue,
+                'average_job_seconds': round(self._avg_seconds, 3),
+                'submitted': self.submitted,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self, timeout: float = 2.0):
+        """等待佇列中的工作完成後停止工作執行緒"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    # ===== 內部工具 =====
+
+    def _retry_after(self, incoming: int) -> int:
+        """估算佇列騰出足夠空間所需的秒數（呼叫端需持有鎖）；超過容量的批次需等佇列清空"""
+        depth = self._queue.qsize()
+        backlog = depth if incoming > self.max_queue else depth + incoming - self.max_queue
+        return max(1, math.ceil(max(backlog, 1) * self._avg_seconds / self.workers))
+
+    def _worker_loop(self):
+        """工作執行緒主迴圈"""
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+
+            with self._lock:
+                job = self._jobs[job_id]
+                task = self._tasks.pop(job_id)
+                job['status'] = 'running'
+                job['started_at'] = datetime.datetime.now().isoformat()
+                self.busy_workers += 1
+            started = time.monotonic()
+
+            error = None
+            try:
+                success = task() is not False
+            except Exception as e:
+                success = False
+                error = str(e)
+                logging.error(f"語音生成工作 {job_id} 失敗: {e}")
+
+            duration = time.monotonic() - started
+            with self._lock:
+                self.busy_workers -= 1
+                self.busy_seconds += duration
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * duration
+                job['status'] = 'succeeded' if success else 'failed'
+                job['error'] = None if success else (error or '語音生成失敗')
+                job['finished_at'] = datetime.datetime.now().isoformat()
+                if success:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+
+    def _trim_finished(self):
+        """只保留最近的已結束工作紀錄（呼叫端需持有鎖）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at']]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -10,14 +10,63 @@ class AudioPlaybackService {
     this.checkInterval = null;
     this.lastPlayedLogId = null;
     this.currentAudio = null;
+    this.cueStream = null;
     
-    // 自動啟動檢查（延遲 2 秒讓應用程式完全載入）
+    // 自動啟動推送串流（延遲 2 秒讓應用程式完全載入）
     setTimeout(() => {
-      this.startPeriodicCheck(1000);
-      console.log('[AudioPlayback] 🚀 自動啟動語音播放檢查服務 (每秒檢查一次)');
+      this.startCueStream();
     }, 2000);
   }
 
+  /**
+   * 開始接收後端推送的播放提示（SSE），無法使用時退回每秒輪詢
+   */
+  startCueStream() {
+    if (typeof EventSource === 'undefined') {
+      console.warn('[AudioPlayback] 不支援 EventSource，改用定時檢查');
+      this.startPeriodicCheck(1000);
+      return;
+    }
+
+    this.stopCueStream();
+
+    const url = `${this.baseUrl}/api/playback/stream`;
+    this.cueStream = new EventSource(url);
+
+    this.cueStream.onopen = () => {
+      console.log('[AudioPlayback] 🚀 已連接播放提示推送串流');
+      // 串流可用時停止輪詢
+      this.stopPeriodicCheck();
+    };
+
+    this.cueStream.onmessage = async (event) => {
+      try {
+        await this.handlePlaybackResponse(JSON.parse(event.data));
+      } catch (error) {
+        console.error('[AudioPlayback] ❌ 處理推送提示時發生錯誤:', error);
+      }
+    };
+
+    this.cueStream.onerror = () => {
+      // EventSource 會自動重連；重連期間暫時以輪詢補位
+      if (!this.checkInterval) {
+        console.warn('[AudioPlayback] 🔗 推送串流中斷，暫時改用定時檢查...');
+        this.startPeriodicCheck(1000);
+      }
+    };
+  }
+
+  /**
+   * 停止推送串流
+   */
+  stopCueStream() {
+    if (this.cueStream) {
+      this.cueStream.close();
+      this.cueStream = null;
+      console.log('[AudioPlayback] 停止推送串流');
+    }
+  }
+
   /**
    * 開始定時檢查是否需要播放語音
    * @param {number} intervalMs - 檢查間隔（毫秒），預設 1000ms
@@ -58,29 +107,7 @@ class AudioPlaybackService {
     try {
       // 呼叫 check-playback API（不再需要傳遞參數，後端會自動從 YouTube 資料獲取）
       const response = await this.fetchCheckPlayback();
-      
-      // 只在有新內容時才記錄詳細資訊
-      if (response.success && response.content && response.content.file_path) {
-        const content = response.content;
-        
-        // 檢查是否是新內容（避免重複播放）
-        if (content.file_path !== this.lastPlayedLogId) {
-          console.log(`[AudioPlayback] 🎵 播放新語音: "${content.message}"`);
-          
-          // 先觸發 MessageBox 顯示事件
-          this.dispatchMessageBoxEvent(content);
-          
-          await this.playAudio(content);
-          this.lastPlayedLogId = content.file_path;
-          
-          // 觸發自定義事件，讓其他組件知道有新語音播放
-          this.dispatchPlaybackEvent(content);
-        }
-      } else if (!response.success) {
-        // 只在錯誤時記錄
-        console.warn(`[AudioPlayback] ⚠️ API 回應錯誤: ${response.error}`);
-      }
-      // 沒有內容時不記錄，避免過多日誌
+      await this.handlePlaybackResponse(response);
     } catch (error) {
       // 區分連接錯誤和其他錯誤
       if (error.message.includes('fetch') || error.message.includes('Failed to fetch')) {
@@ -91,6 +118,35 @@ class AudioPlaybackService {
     }
   }
 
+  /**
+   * 處理 check-playback 回應或推送事件（兩者格式相同）
+   * @param {Object} response - 播放檢查結果
+   */
+  async handlePlaybackResponse(response) {
+    // 只在有新內容時才記錄詳細資訊
+    if (response.success && response.content && response.content.file_path) {
+      const content = response.content;
+      
+      // 檢查是否是新內容（避免重複播放）
+      if (content.file_path !== this.lastPlayedLogId) {
+        console.log(`[AudioPlayback] 🎵 播放新語音: "${content.message}"`);
+        
+        // 先觸發 MessageBox 顯示事件
+        this.dispatchMessageBoxEvent(content);
+        
+        await this.playAudio(content);
+        this.lastPlayedLogId = content.file_path;
+        
+        // 觸發自定義事件，讓其他組件知道有新語音播放
+        this.dispatchPlaybackEvent(content);
+      }
+    } else if (!response.success) {
+      // 只在錯誤時記錄
+      console.warn(`[AudioPlayback] ⚠️ API 回應錯誤: ${response.error}`);
+    }
+    // 沒有內容時不記錄，避免過多日誌
+  }
+
   /**
    * 呼叫 check-playback API（後端會自動從 YouTube 資料獲取時間和影片ID）
    * @returns {Promise<Object>} API 回應
@@ -328,6 +384,7 @@ class AudioPlaybackService {
     return {
       isChecking: this.isChecking,
       hasInterval: !!this.checkInterval,
+      isStreaming: !!this.cueStream && this.cueStream.readyState === 1,
       currentlyPlaying: !!this.currentAudio,
       lastPlayedLogId: this.lastPlayedLogId
     };